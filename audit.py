@@ -0,0 +1,184 @@
+# audit.py - Opt-in prediction audit log (encoded inputs + score)
+#
+# record() only puts the prediction on a bounded in-memory queue; a
+# background writer drains it and appends RecordBatches to an Arrow IPC
+# stream file (audit_logs/audit-<start time>-<pid>-<n>.arrow). A new file is
+# started every max_rows_per_file rows and whenever the model version or the
+# feature count changes (hot reload), so each file has one schema, with the
+# model version in its metadata. When the queue is full the record is
+# dropped and counted rather than blocking the user. Rows carry a keyed hash of the raw
+# inputs and the encoded feature vector. The vector is not anonymous: with
+# the shipped scaler it decodes back to the exact clinical inputs, so the
+# log holds health data (without name or contact details) and must be
+# protected like it.
+#
+# Enabled with AUDIT_LOG=1. AUDIT_LOG_DIR overrides the directory and
+# AUDIT_SALT sets the hash key (random per process otherwise, so hashes
+# only link records within one run).
+#
+# Reading:  pa.ipc.open_stream(path).read_all().to_pandas()
+
+import atexit
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from utils import BASE_DIR
+
+AUDIT_SCHEMA_FIELDS = [
+    ('timestamp', pa.timestamp('ms')),
+    ('input_hash', pa.string()),
+    ('probability', pa.float32()),
+    ('model_version', pa.string()),
+    ('latency_ms', pa.float32()),
+]
+
+
+def audit_enabled():
+    return os.environ.get('AUDIT_LOG', '0').lower() in ('1', 'true', 'yes')
+
+
+class AuditLog:
+    """
+    Buffered append-only audit log with a background writer
+    max_queue: records held in memory before new ones are dropped
+    """
+
+    def __init__(self, directory=None, batch_size=256, flush_interval=2.0,
+                 max_queue=10000, max_rows_per_file=100_000, salt=None):
+        self.directory = directory or os.environ.get('AUDIT_LOG_DIR',
+                                                     os.path.join(BASE_DIR, 'audit_logs'))
+        os.makedirs(self.directory, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows_per_file = max_rows_per_file
+        salt = salt or os.environ.get('AUDIT_SALT') or secrets.token_hex(16)
+        self._key = salt.encode()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._metrics = {'recorded': 0, 'written': 0, 'dropped': 0, 'queue_high_water': 0,
+                         'flushes': 0, 'flush_ms_total': 0.0, 'files': 0, 'last_error': None}
+        self._writer = None
+        self._file_rows = 0
+        self._file_key = None  # (model version, feature count) of the open file
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)  # don't lose the last buffered batch on shutdown
+
+    def record(self, input_data, features, probability, model_version, latency_ms):
+        """Queue one prediction (never blocks); returns False if it was dropped"""
+        item = (time.time(), dict(input_data), np.asarray(features, dtype=np.float32).ravel(),
+                float(probability), str(model_version), float(latency_ms))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._metrics['dropped'] += 1
+            return False
+        with self._lock:
+            self._metrics['recorded'] += 1
+            depth = self._queue.qsize()
+            if depth > self._metrics['queue_high_water']:
+                self._metrics['queue_high_water'] = depth
+        return True
+
+    def input_hash(self, input_data):
+        """Keyed hash of the raw inputs (links records of one patient; does not anonymize them)"""
+        payload = json.dumps(input_data, sort_keys=True, default=str).encode()
+        return hmac.new(self._key, payload, hashlib.sha256).hexdigest()[:16]
+
+    def _run(self):
+        buffer = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                buffer.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if len(buffer) >= self.batch_size or time.monotonic() >= deadline:
+                if buffer:
+                    self._flush(buffer)
+                    buffer = []
+                deadline = time.monotonic() + self.flush_interval
+        if buffer:
+            self._flush(buffer)
+        if self._writer is not None:
+            self._writer.close()
+
+    @staticmethod
+    def schema(model_version, n_features):
+        """Arrow schema of a file holding n_features-long vectors from one model version"""
+        return pa.schema(
+            AUDIT_SCHEMA_FIELDS[:2]
+            + [('features', pa.list_(pa.float32(), n_features))]
+            + AUDIT_SCHEMA_FIELDS[2:],
+            metadata={'model_version': model_version}
+        )
+
+    def _flush(self, items):
+        start = time.perf_counter()
+        try:
+            # Runs of records from one (model version, feature count) go to one file
+            for key, run in itertools.groupby(items, key=lambda item: (item[4], len(item[2]))):
+                self._write(self._record_batch(list(run), *key), key)
+        except Exception as e:
+            with self._lock:
+                self._metrics['last_error'] = str(e)
+            return
+        with self._lock:
+            self._metrics['written'] += len(items)
+            self._metrics['flushes'] += 1
+            self._metrics['flush_ms_total'] += (time.perf_counter() - start) * 1000
+
+    def _record_batch(self, items, model_version, n_features):
+        timestamps, inputs, features, probability, versions, latency = zip(*items)
+        flat = np.concatenate(features)
+        return pa.RecordBatch.from_arrays([
+            pa.array((np.array(timestamps) * 1000).astype(np.int64), pa.timestamp('ms')),
+            pa.array([self.input_hash(x) for x in inputs], pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(flat, pa.float32()), n_features),
+            pa.array(probability, pa.float32()),
+            pa.array(versions, pa.string()),
+            pa.array(latency, pa.float32()),
+        ], schema=self.schema(model_version, n_features))
+
+    def _write(self, batch, key):
+        if (self._writer is None or self._file_rows >= self.max_rows_per_file
+                or key != self._file_key):
+            if self._writer is not None:
+                self._writer.close()
+            name = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._metrics['files']}.arrow"
+            self._writer = pa.ipc.new_stream(os.path.join(self.directory, name), batch.schema)
+            self._file_rows = 0
+            self._file_key = key
+            with self._lock:
+                self._metrics['files'] += 1
+        self._writer.write_batch(batch)
+        self._file_rows += batch.num_rows
+
+    def metrics(self):
+        """Counters plus current queue depth (safe to call from any thread)"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['queue_capacity'] = self._queue.maxsize
+        total = metrics.pop('flush_ms_total')
+        metrics['mean_flush_ms'] = total / metrics['flushes'] if metrics['flushes'] else None
+        return metrics
+
+    def close(self):
+        """Flush everything still queued and close the current file"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
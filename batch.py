@@ -0,0 +1,202 @@
+# batch.py - Chunked screening of patient files (CSV/Parquet)
+#
+# The file is read CHUNK_ROWS rows at a time, each chunk is validated,
+# encoded with preprocess_batch and scored with one predict_proba call,
+# and the scored rows are appended to a gzip CSV on disk. Only one chunk is
+# ever held in memory (besides the uploaded bytes themselves), whatever the
+# file size. Invalid rows are kept in the output with an error message.
+# Chunks go through preprocess_batch rather than utils.compact_batch: a
+# 20,000-row chunk is ~5 MB dense and is scored straight away, so the compact
+# form would only save ~4 MB while adding a decode step before scoring.
+#
+# Each scored row also carries the six risk flags and a recommendation
+# bitmask (utils.recommendation_masks); the recommendation text is only
+# written to the output file, built once per distinct mask.
+#
+# Usage:
+#   python batch.py patients.csv --output screened.csv.gz
+#
+# The app writes its results to temp files (new_output_path); ones older than
+# BATCH_OUTPUT_MAX_AGE seconds (default 6 h) are deleted on the next screening,
+# so abandoned sessions do not fill the disk.
+
+import argparse
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from scoring import predict_proba
+from utils import (RISK_FACTOR_NAMES, calculate_risk_factors_batch, load_models,
+                   materialize_recommendations, preprocess_batch, recommendation_masks)
+from validation import InputSchema, INPUT_COLUMNS
+
+CHUNK_ROWS = 20_000
+OUTPUT_PREFIX = 'screening-'
+OUTPUT_SUFFIX = '.csv.gz'
+
+
+def file_format(name):
+    return 'parquet' if name.lower().endswith('.parquet') else 'csv'
+
+
+def source_size(source):
+    """Size in bytes of a path, Streamlit UploadedFile or open file (None if unknown)"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    if hasattr(source, 'size'):
+        return source.size
+    if hasattr(source, 'fileno'):
+        return os.fstat(source.fileno()).st_size
+    return None
+
+
+def remove_stale_outputs(max_age_s=None, directory=None):
+    """Delete app result files older than max_age_s; returns how many were removed"""
+    if max_age_s is None:
+        max_age_s = float(os.environ.get('BATCH_OUTPUT_MAX_AGE', 6 * 3600))
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for entry in os.scandir(directory or tempfile.gettempdir()):
+        if not (entry.name.startswith(OUTPUT_PREFIX) and entry.name.endswith(OUTPUT_SUFFIX)):
+            continue
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # already gone or still held open by another session
+    return removed
+
+
+def new_output_path():
+    """Fresh temp file for one screening result (stale ones are removed first)"""
+    remove_stale_outputs()
+    fd, path = tempfile.mkstemp(prefix=OUTPUT_PREFIX, suffix=OUTPUT_SUFFIX)
+    os.close(fd)
+    return path
+
+
+def iter_chunks(source, fmt, chunk_rows=CHUNK_ROWS):
+    """DataFrames of at most chunk_rows rows from a path or binary file object"""
+    if fmt == 'parquet':
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+
+
+def score_chunk(models_dict, schema, chunk):
+    """
+    Input chunk plus probability, prediction, risk label, risk flags,
+    recommendation bitmask and error message
+    (invalid rows get no score, only the reason)
+    """
+    result = schema.validate(chunk)
+    probability = np.full(len(chunk), np.nan)
+    if result.valid.any():
+        X = preprocess_batch(result.data[result.valid], models_dict['scaler'],
+                             models_dict['label_tables'], models_dict['feature_names'])
+        probability[result.valid] = predict_proba(models_dict, X)
+
+    prediction = pd.array(np.where(probability > 0.5, 1, 0), dtype='Int8')
+    prediction[~result.valid] = pd.NA
+    flags = calculate_risk_factors_batch(result.data)  # invalid rows are masked below
+    masks = recommendation_masks(prediction.to_numpy(dtype=np.int8, na_value=-1), flags)
+
+    errors = np.full(len(chunk), '', dtype=object)
+    for row in np.flatnonzero(~result.valid):
+        errors[row] = '; '.join(result.error_messages(row))
+
+    out = chunk.copy()
+    out['probability'] = probability.round(4)
+    out['prediction'] = prediction
+    out['risk'] = np.where(~result.valid, '', np.where(probability > 0.5, 'Tinggi', 'Rendah'))
+    for name in RISK_FACTOR_NAMES:
+        out[name] = pd.arrays.BooleanArray(flags[name], ~result.valid)
+    out['recommendation_mask'] = pd.arrays.IntegerArray(masks, ~result.valid)
+    out['error'] = errors
+    return out
+
+
+def screen_file(models_dict, source, fmt, output_path, chunk_rows=CHUNK_ROWS,
+                on_chunk=None, run=None):
+    """
+    Score a whole file chunk by chunk into a gzip CSV at output_path
+    on_chunk(scored_chunk, stats) is called after every chunk (live progress)
+    run(fn, *args): how chunks are executed, e.g. a ScoringExecutor method
+    Returns the final stats dict
+    """
+    schema = InputSchema.from_models(models_dict)
+    run = run or (lambda fn, *args: fn(*args))
+    size = source_size(source)
+    total_rows = pq.ParquetFile(source).metadata.num_rows if fmt == 'parquet' else None
+    if fmt == 'parquet' and hasattr(source, 'seek'):
+        source.seek(0)
+
+    stats = {'rows': 0, 'invalid': 0, 'high_risk': 0, 'chunks': 0, 'elapsed_s': 0.0,
+             'rows_per_s': 0.0, 'progress': 0.0}
+    start = time.perf_counter()
+    with gzip.open(output_path, 'wt', newline='') as out:
+        for chunk in iter_chunks(source, fmt, chunk_rows):
+            missing = [c for c in INPUT_COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"Missing column(s): {missing}")
+            scored = run(score_chunk, models_dict, schema, chunk)
+            masks = scored['recommendation_mask'].to_numpy(dtype=np.uint16, na_value=0)  # 0: no text
+            scored.assign(recommendations=materialize_recommendations(masks, sep='; ')).to_csv(
+                out, header=stats['chunks'] == 0, index=False)
+
+            stats['chunks'] += 1
+            stats['rows'] += len(scored)
+            stats['invalid'] += int(scored['prediction'].isna().sum())
+            stats['high_risk'] += int((scored['prediction'] == 1).sum())
+            stats['elapsed_s'] = time.perf_counter() - start
+            stats['rows_per_s'] = stats['rows'] / stats['elapsed_s']
+            if total_rows:
+                stats['progress'] = stats['rows'] / total_rows
+            elif size and hasattr(source, 'tell'):
+                stats['progress'] = min(source.tell() / size, 1.0)
+            if on_chunk is not None:
+                on_chunk(scored, stats)
+    stats['progress'] = 1.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen a CSV/Parquet file of patients")
+    parser.add_argument('input')
+    parser.add_argument('--output', default=None, help="gzip CSV (default: <input>.screened.csv.gz)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        models_dict = load_models()
+    if models_dict is None:
+        raise SystemExit("❌ Models could not be loaded")
+
+    import resource  # Unix only; the app imports this module too
+
+    output = args.output or f"{args.input}.screened.csv.gz"
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(args.input, 'rb') as source:
+        stats = screen_file(models_dict, source, file_format(args.input), output, args.chunk_rows,
+                            on_chunk=lambda _, s: print(f"   • {s['rows']:>10,} rows  "
+                                                        f"{s['progress']*100:5.1f}%  "
+                                                        f"{s['rows_per_s']:>9,.0f} rows/s"))
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"\n✅ {stats['rows']:,} rows in {stats['elapsed_s']:.1f}s ({stats['rows_per_s']:,.0f} rows/s), "
+          f"{stats['invalid']:,} invalid, {stats['high_risk']:,} high risk")
+    print(f"💾 {output} ({os.path.getsize(output)/1e6:.1f} MB)")
+    print(f"📈 Peak RSS {rss_after/1024:.0f} MB (+{(rss_after - rss_before)/1024:.0f} MB while screening)")
+
+
+if __name__ == '__main__':
+    main()
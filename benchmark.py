@@ -0,0 +1,655 @@
+# benchmark.py - Correctness checks & latency benchmarks for the scoring paths
+#
+# Usage:
+#   python benchmark.py encode        # encode_row vs preprocess_input
+#   python benchmark.py encode --n 5000 --seed 1
+#   python benchmark.py shadow        # user-path latency with XGBoost shadow scoring
+#   python benchmark.py warmup        # first requests after boot vs steady state
+#   python benchmark.py audit         # audit log overhead, file round trip, backpressure
+#   python benchmark.py firstpaint    # Home render time after server start
+#   python benchmark.py speculative   # analyse click with/without step-3 speculation
+#   python benchmark.py executor      # concurrent sessions: inline vs bounded executor
+#   python benchmark.py heatmap       # 50x50 risk map: batched vs per-row, cold vs cached
+#   python benchmark.py similar       # similar-patient index over 1M records: build, memory, query
+#   python benchmark.py compact       # peak memory per 1M scored rows: dense float64 vs CompactBatch
+#   python benchmark.py xgboost       # RF champion vs XGBoost (wrapper, inplace_predict) on identical batches
+#   python benchmark.py render        # results page: delta messages per rerun, rerun time, HTML cache
+
+import argparse
+import contextlib
+import io
+import os
+import multiprocessing
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+
+from audit import AuditLog
+from booster import BoosterScorer
+from forest import CompiledForest
+from registry import run_results_path, warm_up
+from results import render_results
+from executor import ScoringBusy, ScoringExecutor, limit_intra_op_threads
+from scoring import compute_score, score_patient, predict_proba
+from speculative import SpeculativeScorer, precompute
+from shadow import ShadowScorer
+from similar import SimilarityIndex
+from whatif import HEATMAP_SIZE, sweep_2d
+from explain import explain_prediction, aggregation_matrix
+from utils import (
+    load_models, preprocess_input, preprocess_batch, compact_batch, encode_row, encode_labels, generate_synthetic_patients,
+    calculate_risk_factors, calculate_risk_factors_batch, get_health_recommendations,
+    recommendation_masks, materialize_recommendations, create_heatmap_chart
+)
+
+# Bin edges used by the feature engineering, sampled on purpose so the
+# property checks hit every boundary
+BOUNDARY_VALUES = {
+    'Age': [40, 50, 55, 60],
+    'RestingBP': [120, 130, 140],
+    'Cholesterol': [0, 200, 240],
+    'Oldpeak': [1.5],
+}
+
+
+def random_raw_patient(rng):
+    """Random raw input within the Streamlit widget bounds (steps 1-3)"""
+    patient = {
+        'Age': int(rng.integers(1, 121)),
+        'Sex': str(rng.choice(['M', 'F'])),
+        'ChestPainType': str(rng.choice(['ASY', 'NAP', 'ATA', 'TA'])),
+        'RestingBP': int(rng.integers(80, 201)),
+        'Cholesterol': int(rng.integers(0, 601)),
+        'FastingBS': int(rng.integers(0, 2)),
+        'RestingECG': str(rng.choice(['Normal', 'ST', 'LVH'])),
+        'MaxHR': int(rng.integers(60, 221)),
+        'ExerciseAngina': str(rng.choice(['N', 'Y'])),
+        'Oldpeak': round(float(rng.uniform(-3.0, 7.0)), 1),
+        'ST_Slope': str(rng.choice(['Up', 'Flat', 'Down'])),
+    }
+    for col, values in BOUNDARY_VALUES.items():
+        if rng.random() < 0.3:
+            patient[col] = type(patient[col])(rng.choice(values))
+    return patient
+
+
+def time_call(fn, repeats):
+    """Per-call latencies in microseconds"""
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def print_latency(label, timings_us):
+    print(f"   • {label:<22} p50 {np.percentile(timings_us, 50):>10.1f} µs"
+          f"   p99 {np.percentile(timings_us, 99):>10.1f} µs")
+
+
+def bench_encode(models_dict, n, seed):
+    """Property check encode_row == preprocess_input on random inputs, plus latency"""
+    args = (models_dict['scaler'], models_dict['label_encoders'], models_dict['feature_names'])
+    fast_args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    rng = np.random.default_rng(seed)
+
+    print(f"\n🔍 Checking encode_row against preprocess_input on {n} random patients...")
+    for _ in range(n):
+        patient = random_raw_patient(rng)
+        expected = preprocess_input(patient, *args)
+        actual = encode_row(patient, *fast_args)
+        if not np.array_equal(actual, expected):
+            raise AssertionError(f"encode_row mismatch for {patient}")
+    print("✅ All rows identical")
+
+    patient = random_raw_patient(rng)
+    print("\n⏱️ Single-row latency:")
+    print_latency('preprocess_input', time_call(lambda: preprocess_input(patient, *args), 200))
+    print_latency('encode_row', time_call(lambda: encode_row(patient, *fast_args), 2000))
+
+    le = models_dict['label_encoders']['ST_Slope']
+    tables = models_dict['label_tables']
+    batch = np.array([random_raw_patient(rng)['ST_Slope'] for _ in range(10000)])
+    print("\n⏱️ Label encoding (ST_Slope):")
+    print_latency('LabelEncoder, 1 row', time_call(lambda: le.transform(np.array(['Flat'])), 500))
+    print_latency('label table, 1 row', time_call(lambda: encode_labels('ST_Slope', 'Flat', tables), 5000))
+    print_latency('LabelEncoder, 10k rows', time_call(lambda: le.transform(batch), 50))
+    print_latency('label table, 10k rows', time_call(lambda: encode_labels('ST_Slope', batch, tables), 50))
+
+
+def bench_recommendations(models_dict, n, seed):
+    """Per-patient dict/list path vs batch flags + bitmask, time and bytes per row"""
+    df = generate_synthetic_patients(n, models_dict['scaler'], seed=seed)
+    predictions = np.random.default_rng(seed).integers(0, 2, n)
+    rows = df.to_dict('records')
+
+    start = time.perf_counter()
+    texts = [get_health_recommendations(p, None, calculate_risk_factors(r))
+             for p, r in zip(predictions, rows)]
+    loop_s = time.perf_counter() - start
+    text_bytes = sum(len(t.encode()) for recs in texts for t in recs)
+
+    start = time.perf_counter()
+    flags = calculate_risk_factors_batch(df)
+    masks = recommendation_masks(predictions, flags)
+    batch_s = time.perf_counter() - start
+    packed_bytes = masks.nbytes + sum(v.nbytes for v in flags.values())
+
+    assert materialize_recommendations(masks[:100]) == ["\n".join(t) for t in texts[:100]]
+    print(f"\n📋 Risk factors & recommendations for {n} patients:")
+    print(f"   • per-patient lists     {loop_s*1000:>9.1f} ms   {text_bytes/n:>7.1f} bytes/row (text only)")
+    print(f"   • batch flags + bitmask {batch_s*1000:>9.1f} ms   {packed_bytes/n:>7.1f} bytes/row")
+
+
+def bench_explain(models_dict, n, seed):
+    """Additivity check of the path attributions, plus per-patient latency"""
+    args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    model = models_dict['scoring_model']
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    compiled = CompiledForest(model)
+    compiled.node_contributions
+    print(f"\n🌲 Compiled forest + contribution tables: {(time.perf_counter() - start)*1000:.1f} ms "
+          f"({compiled.node_contributions.nbytes/1e6:.1f} MB)")
+
+    matrix = aggregation_matrix(models_dict['feature_names'], models_dict['original_features'])
+    assert np.allclose(matrix.sum(axis=1), 1), "every encoded column must map to raw inputs"
+
+    print(f"\n🔍 Checking bias + sum(contributions) == predict_proba on {n} random patients...")
+    rows = [encode_row(random_raw_patient(rng), *args) for _ in range(n)]
+    expected = model.predict_proba(np.vstack(rows))[:, 1]
+    worst = 0.0
+    for row, proba in zip(rows, expected):
+        explanation = explain_prediction(compiled, row, models_dict['feature_names'],
+                                         models_dict['original_features'])
+        total = explanation['bias'] + sum(explanation['contributions'].values())
+        worst = max(worst, abs(total - proba), abs(explanation['prediction'] - proba))
+    assert worst < 1e-9, f"additivity violated by {worst}"
+    print(f"✅ Additive (max error {worst:.2e})")
+
+    row = rows[0]
+    print("\n⏱️ Per-patient attribution (target < 20 ms):")
+    print_latency('explain_prediction', time_call(
+        lambda: explain_prediction(compiled, row, models_dict['feature_names'],
+                                   models_dict['original_features']), 500))
+
+
+def bench_shadow(models_dict, n, seed):
+    """User-path latency with and without XGBoost shadow scoring, plus agreement stats"""
+    if not models_dict['xgb_available']:
+        raise SystemExit("❌ XGBoost model not available")
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    shadow = ShadowScorer(models_dict['xgb_model'], max_pending=n)
+
+    timings = {}
+    for label, scorer in (('champion only', None), ('champion + shadow', shadow)):
+        timings[label] = np.empty(n)
+        for i, patient in enumerate(patients):
+            start = time.perf_counter()
+            score_patient(models_dict, patient, shadow=scorer)
+            timings[label][i] = time.perf_counter() - start
+    shadow.wait()
+    shadow.shutdown()
+
+    print(f"\n⏱️ score_patient latency over {n} patients:")
+    for label, t in timings.items():
+        print_latency(label, t * 1e6)
+    stats = shadow.stats()
+    print(f"\n🕶️ Shadow ({stats['challenger']}): {stats['scored']} scored, "
+          f"{stats['dropped']} dropped, {stats['errors']} errors")
+    print(f"   • agreement {stats['agreement_rate']*100:.1f}%   "
+          f"mean Δ {stats['mean_delta']:+.3f}   mean |Δ| {stats['mean_abs_delta']:.3f}   "
+          f"max |Δ| {stats['max_abs_delta']:.3f}")
+    print(f"   • |Δ| histogram {stats['abs_delta_histogram']}")
+
+
+def _first_requests(warm, n, seed):
+    """Fresh process: load models, optionally warm up, time the results path per patient"""
+    warnings.filterwarnings('ignore')
+    with contextlib.redirect_stdout(io.StringIO()):
+        models_dict = load_models()
+        models_dict['compiled_forest'] = CompiledForest(models_dict['scoring_model'])
+        start = time.perf_counter()
+        if warm:
+            warm_up(models_dict)
+        warm_s = time.perf_counter() - start
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    return warm_s, [time_call(lambda: run_results_path(models_dict, p), 1)[0] for p in patients]
+
+
+WARMUP_MAX_RATIO = 1.2  # first-10 p99 / steady p99 allowed after warm-up
+
+
+def bench_warmup(models_dict, n, seed):
+    """
+    p99 of the first 10 requests after boot vs steady state, with and without
+    warm-up; fails if the warmed first requests exceed WARMUP_MAX_RATIO x steady p99
+    """
+    n = max(n, 110)
+    ctx = multiprocessing.get_context('spawn')
+    print(f"\n⏱️ Results path per request, fresh process each ({n} requests):")
+    for warm in (False, True):
+        with ctx.Pool(1) as pool:
+            warm_s, timings = pool.apply(_first_requests, (warm, n, seed))
+        first, steady = np.array(timings[:10]), np.array(timings[10:])
+        ratio = np.percentile(first, 99) / np.percentile(steady, 99)
+        label = f"warm-up ({warm_s:.1f}s)" if warm else "no warm-up"
+        print(f"   {label}:")
+        print_latency('first 10 requests', first)
+        print_latency('steady state', steady)
+        print(f"   • first-10 p99 / steady p99 = {ratio:.2f}x")
+    assert ratio <= WARMUP_MAX_RATIO, (
+        f"first 10 requests after warm-up: p99 {ratio:.2f}x steady state (max {WARMUP_MAX_RATIO}x)")
+    print(f"\n✅ With warm-up the first 10 requests stay within {WARMUP_MAX_RATIO}x of steady-state p99")
+
+
+def bench_audit(models_dict, n, seed):
+    """User-path latency with the audit log on, round trip of the file, and a burst past the queue"""
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    with tempfile.TemporaryDirectory() as directory:
+        audit = AuditLog(directory)
+        print(f"\n⏱️ score_patient latency over {n} patients:")
+        for label, log in (('no audit', None), ('audit log', audit)):
+            print_latency(label, np.array([
+                time_call(lambda: score_patient(models_dict, p, audit=log), 1)[0] for p in patients]))
+        audit.close()
+        metrics = audit.metrics()
+        table = pa.concat_tables(pa.ipc.open_stream(os.path.join(directory, f)).read_all()
+                                 for f in sorted(os.listdir(directory)))
+        assert table.num_rows == n == metrics['written'], (table.num_rows, metrics)
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"\n🗂️ {table.num_rows} rows in {metrics['files']} file(s), {size/n:.0f} bytes/row, "
+              f"{metrics['flushes']} flushes, mean flush {metrics['mean_flush_ms']:.1f} ms")
+
+        # Burst far beyond the queue with a slow writer: records are dropped, never block
+        burst = AuditLog(directory, max_queue=1000, flush_interval=60)
+        row = encode_row(patients[0], models_dict['scaler'], models_dict['label_tables'],
+                         models_dict['feature_names'])
+        timings = time_call(lambda: burst.record(patients[0], row, 0.5, 'bench', 1.0), 20000)
+        burst_metrics = burst.metrics()
+        burst.close()
+        print(f"\n🚦 Burst of 20000 records into a 1000-slot queue:")
+        print_latency('record()', timings)
+        print(f"   • recorded {burst_metrics['recorded']}, dropped {burst_metrics['dropped']}, "
+              f"queue high water {burst_metrics['queue_high_water']}")
+
+
+# Run in a clean interpreter: a spawned worker would re-import this module
+# (and with it sklearn/xgboost), hiding exactly the start-up cost measured here
+FIRST_PAINT_SCRIPT = """
+import contextlib, io, sys, time, warnings
+warnings.filterwarnings('ignore')
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    app.run()
+    home_s = time.perf_counter() - start
+    next(b for b in app.button if b.label == "\U0001fa7a Check").click()
+    app.run()
+print(home_s, time.perf_counter() - start)
+"""
+
+
+def bench_firstpaint(models_dict, n, seed):
+    """Time to first paint of the Home page after server start (fresh process per run)"""
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+    runs = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, '-c', FIRST_PAINT_SCRIPT, app_path],
+                             capture_output=True, text=True, check=True).stdout
+        runs.append([float(v) for v in out.split()[-2:]])
+    home, check = np.array(runs).T * 1000
+    print("\n⏱️ Fresh start, 3 runs (ms):")
+    print(f"   • Home first paint       {np.median(home):>8.0f}   (min {home.min():.0f}, max {home.max():.0f})")
+    print(f"   • Check page ready       {np.median(check):>8.0f}   (min {check.min():.0f}, max {check.max():.0f})")
+
+
+RESULTS_RENDER_SCRIPT = """
+import contextlib, io, sys, time, warnings
+warnings.filterwarnings('ignore')
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+with contextlib.redirect_stdout(io.StringIO()):
+    app.run()
+    for label in ["\U0001fa7a Check", "Lanjut ke Langkah 2 \u2192", "Lanjut ke Langkah 3 \u2192",
+                  "Lanjut ke Review \u2192", "\U0001f50d Analisis Sekarang"]:
+        next(b for b in app.button if b.label == label).click()
+        app.run()
+    timings = []
+    for _ in range(int(sys.argv[2])):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+
+def deltas(node):
+    children = getattr(node, 'children', None)
+    if children is None:
+        return 1
+    return 1 + sum(deltas(c) for c in (children.values() if isinstance(children, dict) else children))
+
+print(deltas(app._tree.children[0]), len(app.markdown), *timings)
+"""
+
+
+def bench_render(models_dict, n, seed):
+    """
+    Results page rerun: elements (one delta message each) and server-side
+    rerun time, plus the cost of building the results HTML
+    """
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+    repeats = min(n, 30)
+    values = subprocess.run([sys.executable, '-c', RESULTS_RENDER_SCRIPT, app_path, str(repeats)],
+                            capture_output=True, text=True, check=True).stdout.split()[-(repeats + 2):]
+    elements, markdowns = int(values[0]), int(values[1])
+    timings = np.array(values[2:], dtype=float) * 1e6
+    print(f"\n📨 Results page: {elements} elements/blocks per rerun ({markdowns} st.markdown)")
+    print_latency('rerun (server)', timings)
+
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    args = [(int(p['Cholesterol'] > 240), rng.random(), calculate_risk_factors(p), p) for p in patients]
+    print(f"\n⏱️ render_results over {n} patients:")
+    print_latency('new prediction', np.concatenate([time_call(lambda: render_results(*a), 1) for a in args]))
+    print_latency('cached', np.concatenate([time_call(lambda: render_results(*a), 1) for a in args]))
+
+
+def bench_speculative(models_dict, n, seed):
+    """Analyse-click latency: computing on click vs taking the step-3 speculation"""
+    models_dict = dict(models_dict, model_version='bench',
+                       compiled_forest=CompiledForest(models_dict['scoring_model']))
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    scorer = SpeculativeScorer()
+
+    on_click, taken = np.empty(n), np.empty(n)
+    for i, patient in enumerate(patients):
+        on_click[i] = time_call(lambda: precompute(models_dict, dict(patient, Age=patient['Age'] + 1)), 1)[0]
+        session = {}
+        scorer.submit(session, models_dict, patient)
+        time.sleep(0.05)  # the user reading the review page
+        taken[i] = time_call(lambda: scorer.take(session, models_dict, patient), 1)[0]
+        assert scorer.take(session, models_dict, patient) is None  # consumed
+
+    # Inputs edited after step 3: the speculation must not be used
+    session = {}
+    scorer.submit(session, models_dict, patients[0])
+    assert scorer.take(session, models_dict, dict(patients[0], Cholesterol=0)) is None
+    assert not session
+
+    print(f"\n⏱️ Analyse click over {n} patients (score + risk curve + what-if engine):")
+    print_latency('computed on click', on_click)
+    print_latency('speculated at step 3', taken)
+    print(f"   • {scorer.metrics()}")
+
+
+def bench_executor(models_dict, n, seed, sessions=32, think_s=0.2):
+    """
+    Many concurrent sessions scoring inline vs through the bounded executor
+    Each session pauses think_s (exponential) before a request: about 1.5x
+    what one core can score, so the executor has to shed load
+    """
+    limit_intra_op_threads(models_dict, 1)
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(n)]
+    pauses = rng.exponential(think_s, n)
+
+    def drive(score):
+        latencies, busy = [], []
+        lock = threading.Lock()
+
+        def session(i):
+            time.sleep(pauses[i])
+            start = time.perf_counter()
+            try:
+                score(patients[i % n])
+                kind = latencies
+            except ScoringBusy:
+                kind = busy
+            with lock:
+                kind.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as clients:
+            list(clients.map(session, range(n)))
+        return np.array(latencies), np.array(busy), time.perf_counter() - start
+
+    executor = ScoringExecutor(max_workers=2, max_queue=8)
+    print(f"\n⏱️ {n} requests from {sessions} concurrent sessions:")
+    for label, score in (('inline', lambda p: compute_score(models_dict, p)),
+                         ('executor', lambda p: executor.run(compute_score, models_dict, p))):
+        latencies, busy, elapsed = drive(score)
+        print(f"   {label}: {len(latencies)} served, {len(busy)} busy, {len(latencies)/elapsed:.0f} req/s")
+        print_latency('served', latencies)
+        if len(busy):
+            print_latency('busy response', busy)
+    metrics = executor.metrics()
+    print(f"   • executor wait p50 {metrics['wait_ms_p50']:.1f} ms, p99 {metrics['wait_ms_p99']:.1f} ms, "
+          f"max queue depth {metrics['max_queue_depth']}, rejected {metrics['rejected']}")
+
+    # Queued calls cancelled before they start (SpeculativeScorer.discard) must free their slot
+    executor = ScoringExecutor(max_workers=1, max_queue=4)
+    for cycle in range(10):
+        gate = threading.Event()
+        blocker = executor.submit(gate.wait)
+        try:
+            queued = [executor.submit(time.sleep, 0) for _ in range(4)]
+            assert all(future.cancel() for future in queued), cycle
+        finally:
+            gate.set()
+        blocker.result()
+    metrics = executor.metrics()
+    assert metrics['running'] == 0 and metrics['queue_depth'] == 0, metrics
+    assert metrics['cancelled'] == 40, metrics
+    executor.run(time.sleep, 0)
+    print(f"\n✅ 10 cycles of 4 cancelled queued calls: queue depth back to 0, "
+          f"{metrics['cancelled']} slots released")
+
+
+def bench_heatmap(models_dict, n, seed):
+    """
+    Risk map end to end (grid scoring + Plotly figure serialized like Streamlit
+    does) for new patients and for cached ones, plus a check against per-row scoring
+    """
+    rng = np.random.default_rng(seed)
+    patients = [random_raw_patient(rng) for _ in range(min(n, 200))]
+    axes = [('Age', 'Cholesterol'), ('MaxHR', 'Oldpeak')]
+
+    x_grid, y_grid, surface = sweep_2d(patients[0], *axes[0], models_dict)
+    for i, j in rng.integers(0, HEATMAP_SIZE, (20, 2)):
+        expected = compute_score(models_dict, dict(patients[0], Age=x_grid[j], Cholesterol=y_grid[i]))
+        assert abs(expected['probability'] - surface[i, j]) < 1e-12, (i, j)
+    print(f"\n✅ {HEATMAP_SIZE}x{HEATMAP_SIZE} surface matches per-row compute_score on 20 random cells")
+
+    def render(patient, x_field, y_field):
+        x_grid, y_grid, surface = sweep_2d(patient, x_field, y_field, models_dict)
+        create_heatmap_chart(x_grid, y_grid, surface, x_field, y_field,
+                             (patient[x_field], patient[y_field])).to_json()
+
+    cells = HEATMAP_SIZE * HEATMAP_SIZE
+    args = (models_dict['scaler'], models_dict['label_encoders'], models_dict['feature_names'])
+    per_row = time_call(lambda: models_dict['scoring_model'].predict_proba(
+        preprocess_input(patients[0], *args)), 50)
+    print(f"\n⏱️ Risk map, {cells} cells, {len(patients)} patients x {len(axes)} axis pairs:")
+    print(f"   • per-row preprocess_input + predict_proba (extrapolated): "
+          f"{np.median(per_row) * cells / 1e3:,.0f} ms")
+    for label in ('new patient', 'cached'):
+        timings = np.concatenate([time_call(lambda: render(p, *a), 1) for p in patients for a in axes])
+        print(f"   • {label:<12} p50 {np.percentile(timings, 50)/1e3:>7.1f} ms"
+              f"   p99 {np.percentile(timings, 99)/1e3:>7.1f} ms")
+
+
+def bench_similar(models_dict, n, seed, records=1_000_000):
+    """
+    Index a synthetic cohort, check top-k against brute-force leaf comparison
+    on a small cohort, then time top-10 queries on the full one
+    """
+    forest = models_dict['scoring_model']
+    compiled = CompiledForest(forest)
+    encode_args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    rng = np.random.default_rng(seed)
+    queries = [encode_row(random_raw_patient(rng), *encode_args) for _ in range(n)]
+
+    small = preprocess_batch(generate_synthetic_patients(5000, models_dict['scaler'], seed=seed),
+                             *encode_args)
+    index = SimilarityIndex.build(forest, small, np.zeros(len(small)))
+    leaves = forest.apply(small.astype(np.float32))
+    for row in queries[:50]:
+        expected = (leaves == np.asarray(compiled.apply(row))).sum(axis=1)
+        ids, proximity = index.query(compiled.apply(row), k=10)
+        shared = np.rint(proximity * compiled.n_trees)
+        assert np.array_equal(np.sort(expected)[::-1][:10], shared)
+        assert np.array_equal(expected[ids], shared)
+    print("\n✅ Top-10 proximities match brute-force leaf comparison (5,000 records, 50 patients)")
+
+    X = np.empty((records, len(models_dict['feature_names'])), dtype=np.float32)
+    for start in range(0, records, 100_000):
+        df = generate_synthetic_patients(min(100_000, records - start), models_dict['scaler'],
+                                         seed=seed + 1 + start)
+        X[start:start + len(df)] = preprocess_batch(df, *encode_args)
+    start = time.perf_counter()
+    index = SimilarityIndex.build(forest, X, np.zeros(records))
+    build_s = time.perf_counter() - start
+    del X
+    print(f"\n🗂️ {records:,} records x {index.n_trees} trees: built in {build_s:.1f}s, "
+          f"{index.nbytes/1e6:.0f} MB ({index.nbytes/records:.0f} B/record)")
+
+    lengths = [sum(np.diff(index.indptr)[index.node_offsets + np.asarray(compiled.apply(r))])
+               for r in queries[:100]]
+    print(f"\n⏱️ Top-10 query over {n} patients (mean {np.mean(lengths)/records:.1f} postings/record):")
+    print_latency('leaves (apply)', np.concatenate([time_call(lambda: compiled.apply(r), 1) for r in queries]))
+    print_latency('query', np.concatenate([
+        time_call(lambda: index.neighbours(compiled, r, k=10), 1) for r in queries]))
+
+
+def bench_compact(models_dict, n, seed, records=1_000_000):
+    """
+    Peak traced memory (NumPy buffers) and time to encode + score `records`
+    rows: dense float64 preprocess_batch vs compact_batch; inputs excluded
+    """
+    encode_args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    df = generate_synthetic_patients(records, models_dict['scaler'], seed=seed)
+    columns = {col: df[col].to_numpy() for col in df.columns}
+    del df
+
+    results = {}
+    tracemalloc.start()
+    for label, encode in (('dense float64', preprocess_batch), ('compact', compact_batch)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        X = encode(columns, *encode_args)
+        encoded = tracemalloc.get_traced_memory()[0] - base
+        proba = predict_proba(models_dict, X)
+        elapsed = time.perf_counter() - start
+        results[label] = (encoded, tracemalloc.get_traced_memory()[1] - base, elapsed, proba)
+        del X, proba
+    tracemalloc.stop()
+
+    assert np.array_equal(results['dense float64'][3], results['compact'][3])
+    print(f"\n✅ Compact and dense probabilities identical ({records:,} rows)")
+    print(f"\n💾 Per {records/1e6:g}M rows (encode + predict_proba):")
+    for label, (encoded, peak, elapsed, _) in results.items():
+        print(f"   • {label:<14} matrix {encoded/1e6:>6.0f} MB   peak {peak/1e6:>6.0f} MB   {elapsed:.1f}s")
+
+    # Categorical block as CSR instead of int8 codes, for reference
+    compact = compact_batch({c: v[:100_000] for c, v in columns.items()}, *encode_args)
+    one_hot = compact.codes != 0
+    csr_bytes = one_hot.sum() * (4 + 4) + (len(one_hot) + 1) * 8  # float32 data + int32 indices
+    print(f"   • categorical block: int8 codes {compact.codes.nbytes / len(one_hot):.0f} B/row, "
+          f"CSR {csr_bytes / len(one_hot):.0f} B/row")
+
+
+def bench_xgboost(models_dict, n, seed, sizes=(1, 64, 1024, 100_000)):
+    """
+    Latency and throughput of the RF champion, XGBoost through the sklearn
+    wrapper and XGBoost through BoosterScorer, on identical encoded batches
+    """
+    xgb = models_dict['xgb_model']
+    if xgb is None:
+        raise SystemExit("❌ XGBoost model not available")
+    limit_intra_op_threads(models_dict, 1)
+    scorer = BoosterScorer(xgb, n_threads=1)
+    encode_args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    df = generate_synthetic_patients(max(sizes), models_dict['scaler'], seed=seed)
+    X64 = preprocess_batch(df, *encode_args)
+    X = X64.astype(np.float32)
+    compact = compact_batch(df, *encode_args)
+    table = pa.table({name: X[:, j] for j, name in enumerate(models_dict['feature_names'])})
+
+    expected = xgb.predict_proba(X)[:, 1]
+    for label, batch in (('NumPy', X), ('NumPy float64', X64), ('CompactBatch', compact),
+                         ('Arrow', table)):
+        diff = np.abs(scorer.predict_positive(batch) - expected).max()
+        assert diff < 1e-6, (label, diff)
+    buffer = scorer._buffer
+    for size in sizes:
+        scorer.predict_positive(X64[:size])
+    assert scorer._buffer is buffer, "float64 input reallocated the float32 buffer"
+    print(f"\n✅ inplace_predict matches XGBClassifier.predict_proba (NumPy float32/float64, "
+          f"CompactBatch, Arrow; {len(X):,} rows); float64 input reuses the buffer")
+
+    print("\n⏱️ Same batches, 1 thread each (p50 per call, throughput):")
+    for size in sizes:
+        batch, batch64 = X[:size], X64[:size]
+        out = np.empty(size)
+        repeats = max(3, min(n, 200_000 // size))
+        print(f"   {size:,} rows:")
+        for label, fn in (('RF champion', lambda: models_dict['scoring_model'].predict_proba(batch)),
+                          ('XGB wrapper', lambda: xgb.predict_proba(batch)),
+                          ('XGB inplace', lambda: scorer.predict_positive(batch, out)),
+                          ('XGB f64 in', lambda: scorer.predict_positive(batch64, out))):
+            timings = time_call(fn, repeats)
+            p50 = np.percentile(timings, 50)
+            print(f"   • {label:<12} p50 {p50/1e3:>9.2f} ms   {size / p50 * 1e6:>12,.0f} rows/s")
+
+
+BENCHMARKS = {
+    'encode': bench_encode,
+    'recommendations': bench_recommendations,
+    'explain': bench_explain,
+    'shadow': bench_shadow,
+    'warmup': bench_warmup,
+    'audit': bench_audit,
+    'firstpaint': bench_firstpaint,
+    'speculative': bench_speculative,
+    'executor': bench_executor,
+    'heatmap': bench_heatmap,
+    'similar': bench_similar,
+    'compact': bench_compact,
+    'xgboost': bench_xgboost,
+    'render': bench_render,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring path checks & benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--n', type=int, default=1000, help="Number of random patients")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    with contextlib.redirect_stdout(io.StringIO()):
+        models_dict = load_models()
+    if models_dict is None:
+        raise SystemExit("❌ Models could not be loaded")
+
+    BENCHMARKS[args.benchmark](models_dict, args.n, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# booster.py - Batched XGBoost scoring through Booster.inplace_predict
+#
+# The sklearn wrapper (XGBClassifier.predict_proba) validates the input,
+# builds a DMatrix and returns a fresh (n, 2) array on every call. The
+# booster's in-place prediction reads a float32 NumPy matrix directly. This
+# adapter feeds it dense matrices (float64 ones, as preprocess_batch and the
+# shadow path produce, are cast chunk by chunk), utils.CompactBatch chunks or
+# Arrow tables through one reused float32 buffer, and can write the class-1
+# probabilities straight into a caller-provided output array. It keeps a
+# private copy of the booster with its own thread count, so the shared
+# model's settings are left alone.
+#
+# Threads per call: n_threads, else XGB_THREADS, else SCORING_THREADS_PER_CALL.
+
+import os
+import threading
+
+import numpy as np
+import pyarrow as pa
+
+from executor import threads_per_call
+from utils import CompactBatch, COMPACT_CHUNK_ROWS
+
+
+def is_xgboost_model(model):
+    return hasattr(model, 'get_booster')
+
+
+class BoosterScorer:
+    """
+    predict_proba-compatible scorer for a fitted XGBClassifier (binary:logistic)
+    chunk_rows: rows converted/scored per inplace_predict call for CompactBatch
+                and Arrow input
+    """
+
+    def __init__(self, model, n_threads=None, chunk_rows=COMPACT_CHUNK_ROWS):
+        self.booster = model.get_booster().copy()
+        self.n_threads = n_threads or int(os.environ.get('XGB_THREADS', threads_per_call()))
+        self.booster.set_param({'nthread': self.n_threads})
+        self.missing = model.missing
+        try:
+            best = model.best_iteration  # set only when trained with early stopping
+            self.iteration_range = (0, best + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)  # all trees
+        self.n_features = self.booster.num_features()
+        self.chunk_rows = chunk_rows
+        self._buffer = np.empty((0, self.n_features), dtype=np.float32)
+        self._lock = threading.Lock()  # the input buffer is shared between calls
+
+    def _predict(self, X):
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range,
+                                            missing=self.missing, validate_features=False)
+
+    def _rows(self, n):
+        """Reused float32 input buffer with room for n rows"""
+        if len(self._buffer) < n:
+            self._buffer = np.empty((n, self.n_features), dtype=np.float32)
+        return self._buffer[:n]
+
+    def predict_positive(self, X, out=None):
+        """
+        Class-1 probability for encoded rows
+        X: NumPy matrix, utils.CompactBatch or pyarrow Table/RecordBatch of the features
+           (C-contiguous float32 matrices are passed through as they are)
+        out: float array of len(X) to fill (allocated if None); returned
+        """
+        n = X.num_rows if isinstance(X, (pa.Table, pa.RecordBatch)) else len(X)
+        out = np.empty(n) if out is None else out
+        if isinstance(X, np.ndarray) and X.dtype == np.float32 and X.flags.c_contiguous:
+            out[:] = self._predict(X)  # already in the booster's layout: no copy at all
+            return out
+        with self._lock:
+            for start in range(0, n, self.chunk_rows):
+                rows = min(self.chunk_rows, n - start)
+                buffer = self._rows(rows)
+                if isinstance(X, np.ndarray):
+                    buffer[:] = X[start:start + rows]  # float64 rows cast into the reused buffer
+                elif isinstance(X, CompactBatch):
+                    X.to_dense(start, start + rows, buffer)
+                else:
+                    for j, column in enumerate(X.slice(start, rows).columns):
+                        buffer[:, j] = column.to_numpy(zero_copy_only=False)
+                out[start:start + rows] = self._predict(buffer)
+        return out
+
+    def predict_proba(self, X):
+        """(n, 2) class probabilities, like XGBClassifier.predict_proba"""
+        positive = self.predict_positive(X)
+        return np.column_stack([1 - positive, positive])
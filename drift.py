@@ -0,0 +1,232 @@
+# drift.py - Online drift monitoring of the raw inputs
+#
+# Each scored patient updates fixed-size sketches: a histogram per numeric
+# input (bins = deciles of the reference distribution) and a count per
+# category. Updates are O(1) per prediction (bisect into ~10 edges) and
+# vectorized for batches; memory does not grow with traffic. report()
+# compares the sketches with the reference profile (PSI for every input,
+# binned KS for the numeric ones). Inputs are binned as the model sees them:
+# Cholesterol 0 ("not measured") counts as the training median.
+#
+# The reference profile is exported next to the model:
+#   python drift.py --data train.csv     # from the actual training inputs
+#   python drift.py                      # fallback: from the scaler's training stats
+#   python drift.py --check live.csv     # drift of a file vs the reference
+# Monitoring is on by default; DRIFT_MONITOR=0 disables it.
+
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils import MODELS_DIR, CHOLESTEROL_MEDIAN, load_models, category_frequencies
+
+DRIFT_REFERENCE_FILE = 'drift_reference.json'
+NUMERIC_INPUTS = ['Age', 'RestingBP', 'Cholesterol', 'MaxHR', 'Oldpeak']
+CATEGORICAL_INPUTS = ['Sex', 'ChestPainType', 'FastingBS', 'RestingECG', 'ExerciseAngina', 'ST_Slope']
+N_BINS = 10
+# Not even roughly normal in training: Cholesterol has a spike at the imputed
+# median, Oldpeak about 40% exact zeros. The scaler's mean/std cannot
+# describe them, so a scaler-derived profile leaves them without reference.
+POINT_MASS_INPUTS = ['Cholesterol', 'Oldpeak']
+
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def drift_enabled():
+    return os.environ.get('DRIFT_MONITOR', '1').lower() in ('1', 'true', 'yes')
+
+
+def scored_values(col, values):
+    """Input values as the model sees them (Cholesterol 0 -> training median)"""
+    values = np.asarray(values, dtype=float)
+    return np.where(values == 0, CHOLESTEROL_MEDIAN, values) if col == 'Cholesterol' else values
+
+
+def reference_from_scaler(scaler):
+    """
+    Reference profile from the training stats kept in the scaler: numeric
+    inputs as Normal(mean, std) cut into N_BINS equal-probability bins (None
+    for POINT_MASS_INPUTS), categorical inputs from the one-hot/binary column means
+    """
+    stats = dict(zip(scaler.feature_names_in_, zip(scaler.mean_, scaler.scale_)))
+    z = np.array([NormalDist().inv_cdf(q) for q in np.arange(1, N_BINS) / N_BINS])
+    numeric = {}
+    for col in NUMERIC_INPUTS:
+        if col in POINT_MASS_INPUTS:
+            numeric[col] = None
+            continue
+        mean, std = stats[col]
+        numeric[col] = {
+            'edges': (mean + std * z).round(3).tolist(),
+            'proportions': [1 / N_BINS] * N_BINS,
+        }
+    categorical = {
+        col: {'categories': [str(c) for c in freq], 'proportions': [float(p) for p in freq.values()]}
+        for col, freq in category_frequencies(scaler).items()
+    }
+    return {'source': f"scaler statistics (normal approximation; no reference for "
+                      f"{', '.join(POINT_MASS_INPUTS)})",
+            'numeric': numeric, 'categorical': categorical}
+
+
+def reference_from_data(df):
+    """Reference profile from actual inputs: decile edges and observed proportions"""
+    numeric = {}
+    for col in NUMERIC_INPUTS:
+        values = scored_values(col, df[col])
+        edges = np.unique(np.quantile(values, np.arange(1, N_BINS) / N_BINS))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        numeric[col] = {'edges': edges.tolist(), 'proportions': (counts / counts.sum()).tolist()}
+    categorical = {}
+    for col in CATEGORICAL_INPUTS:
+        freq = df[col].astype(str).value_counts(normalize=True)
+        categorical[col] = {'categories': freq.index.tolist(), 'proportions': freq.tolist()}
+    return {'source': f'training inputs (n={len(df)})', 'numeric': numeric, 'categorical': categorical}
+
+
+def psi(expected, observed, eps=1e-4):
+    """Population stability index between two proportion vectors"""
+    expected = np.clip(np.asarray(expected, dtype=float), eps, None)
+    observed = np.clip(np.asarray(observed, dtype=float), eps, None)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+
+def binned_ks(expected, observed):
+    """Max CDF gap evaluated at the bin edges (lower bound of the exact KS statistic)"""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(observed))))
+
+
+class DriftMonitor:
+    """
+    Constant-memory sketches of the live inputs vs a reference profile
+    Unseen categories are counted in an extra bucket with reference share 0;
+    numeric inputs whose reference is None are not tracked ('no reference').
+    """
+
+    def __init__(self, reference, min_samples=50):
+        self.reference = reference
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._edges = {col: ref['edges'] for col, ref in reference['numeric'].items()
+                       if ref is not None}
+        self._codes = {col: {c: i for i, c in enumerate(ref['categories'])}
+                       for col, ref in reference['categorical'].items()}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.n = 0
+            self.started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._counts = {col: np.zeros(len(edges) + 1, dtype=np.int64)
+                            for col, edges in self._edges.items()}
+            self._counts.update({col: np.zeros(len(codes) + 1, dtype=np.int64)
+                                 for col, codes in self._codes.items()})
+
+    def update(self, input_data):
+        """Add one patient (raw input dict)"""
+        with self._lock:
+            self.n += 1
+            for col, edges in self._edges.items():
+                value = float(scored_values(col, input_data[col]))
+                self._counts[col][bisect.bisect_right(edges, value)] += 1
+            for col, codes in self._codes.items():
+                self._counts[col][codes.get(str(input_data[col]), len(codes))] += 1
+
+    def update_batch(self, data):
+        """Add many patients at once (DataFrame or dict of columns)"""
+        n = len(data[NUMERIC_INPUTS[0]])
+        binned = {col: np.bincount(np.searchsorted(edges, scored_values(col, data[col]), side='right'),
+                                   minlength=len(edges) + 1)
+                  for col, edges in self._edges.items()}
+        for col, codes in self._codes.items():
+            values = pd.Series(np.asarray(data[col])).astype(str)
+            binned[col] = np.bincount(values.map(codes).fillna(len(codes)).to_numpy(dtype=int),
+                                      minlength=len(codes) + 1)
+        with self._lock:
+            self.n += n
+            for col, counts in binned.items():
+                self._counts[col] += counts
+
+    def report(self):
+        """{input: {'psi', 'ks' (numeric only), 'status'}} plus totals"""
+        with self._lock:
+            n = self.n
+            counts = {col: c.copy() for col, c in self._counts.items()}
+        inputs = {}
+        for kind in ('numeric', 'categorical'):
+            for col, ref in self.reference[kind].items():
+                if ref is None:
+                    inputs[col] = {'psi': None, 'ks': None, 'status': 'no reference'}
+                    continue
+                expected = np.append(ref['proportions'], 0.0) if kind == 'categorical' else ref['proportions']
+                observed = counts[col] / n if n else np.zeros(len(expected))
+                entry = {'psi': psi(expected, observed) if n else None}
+                if kind == 'numeric':
+                    entry['ks'] = binned_ks(expected, observed) if n else None
+                if n < self.min_samples:
+                    entry['status'] = 'insufficient data'
+                elif entry['psi'] >= PSI_SIGNIFICANT:
+                    entry['status'] = 'significant'
+                elif entry['psi'] >= PSI_MODERATE:
+                    entry['status'] = 'moderate'
+                else:
+                    entry['status'] = 'stable'
+                inputs[col] = entry
+        return {'n': n, 'since': self.started_at, 'reference': self.reference['source'],
+                'inputs': inputs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the drift reference profile / check a file")
+    parser.add_argument('--data', default=None,
+                        help="CSV/Parquet of training inputs (default: scaler statistics, "
+                             "which leave Cholesterol and Oldpeak without reference)")
+    parser.add_argument('--check', default=None, help="CSV/Parquet of live inputs to compare")
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    args = parser.parse_args()
+
+    read = lambda path: pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    path = os.path.join(args.output_dir, DRIFT_REFERENCE_FILE)
+
+    if args.check:
+        with open(path) as f:
+            monitor = DriftMonitor(json.load(f))
+        df = read(args.check)
+        start = time.perf_counter()
+        monitor.update_batch(df)
+        elapsed = time.perf_counter() - start
+        report = monitor.report()
+        print(f"\n📉 Drift of {args.check} ({report['n']} rows, {elapsed*1000:.1f} ms) "
+              f"vs {report['reference']}")
+        for col, entry in report['inputs'].items():
+            if entry['psi'] is None:
+                print(f"   • {col:<15} {entry['status']}")
+                continue
+            ks = f"   KS {entry['ks']:.3f}" if 'ks' in entry else ""
+            print(f"   • {col:<15} PSI {entry['psi']:.3f}{ks}   {entry['status']}")
+        return
+
+    if args.data:
+        reference = reference_from_data(read(args.data))
+    else:
+        models_dict = load_models()
+        if models_dict is None:
+            raise SystemExit(1)
+        reference = reference_from_scaler(models_dict['scaler'])
+    reference['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(path, 'w') as f:
+        json.dump(reference, f, indent=1)
+    print(f"\n💾 Saved {path} ({reference['source']})")
+
+
+if __name__ == '__main__':
+    main()
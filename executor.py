@@ -0,0 +1,128 @@
+# executor.py - Process-wide bounded scoring executor
+#
+# All sessions share one small thread pool for model calls instead of
+# scoring inline in every script thread. Admission control: when workers
+# plus queue are full, submit() raises ScoringBusy right away so the page
+# can answer "busy" instead of letting latency grow without bound.
+# Intra-op parallelism is capped per call (forest/XGBoost n_jobs), so
+# workers x threads_per_call bounds the threads used for scoring.
+#
+# SCORING_WORKERS (default: CPU count, max 4), SCORING_MAX_QUEUE (default
+# 4 x workers), SCORING_THREADS_PER_CALL (default 1).
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MODEL_KEYS = ['rf_model', 'champion_model', 'fast_model', 'scoring_model', 'xgb_model']
+
+
+class ScoringBusy(RuntimeError):
+    """Raised by ScoringExecutor.submit when the executor is saturated"""
+
+
+def threads_per_call():
+    return int(os.environ.get('SCORING_THREADS_PER_CALL', 1))
+
+
+def limit_intra_op_threads(models_dict, n_threads):
+    """Set n_jobs on every loaded model (sklearn forests, XGBoost)"""
+    for key in MODEL_KEYS:
+        model = models_dict.get(key)
+        if model is not None and 'n_jobs' in model.get_params():
+            model.set_params(n_jobs=n_threads)
+
+
+class ScoringExecutor:
+    """
+    Bounded thread pool with queue-depth and wait-time metrics
+    Same submit() signature as concurrent.futures executors.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, history=1000):
+        self.max_workers = max_workers or int(os.environ.get(
+            'SCORING_WORKERS', min(os.cpu_count() or 1, 4)))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get(
+            'SCORING_MAX_QUEUE', 4 * self.max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='scoring')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._max_queue_depth = 0
+        self._counts = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+        self._wait_ms = deque(maxlen=history)
+        self._run_ms = deque(maxlen=history)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); raises ScoringBusy instead of queueing past capacity"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._counts['rejected'] += 1
+                raise ScoringBusy(f"{self._in_flight} scoring calls in flight")
+            self._in_flight += 1
+            self._counts['submitted'] += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._in_flight - self._running)
+        future = self._executor.submit(self._task, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._release_cancelled)
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """submit() and wait for the result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def run_when_admitted(self, fn, *args, poll_s=0.05, **kwargs):
+        """run(), but wait for a free slot instead of raising ScoringBusy (bulk jobs)"""
+        while True:
+            try:
+                future = self.submit(fn, *args, **kwargs)
+            except ScoringBusy:
+                time.sleep(poll_s)
+                continue
+            return future.result()
+
+    def _release_cancelled(self, future):
+        """A call cancelled while queued never reaches _task: give its slot back here"""
+        if future.cancelled():
+            with self._lock:
+                self._in_flight -= 1
+                self._counts['cancelled'] += 1
+
+    def _task(self, enqueued, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_ms.append((started - enqueued) * 1000)
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._in_flight -= 1
+                self._counts['completed' if ok else 'failed'] += 1
+                self._run_ms.append((time.perf_counter() - started) * 1000)
+
+    def metrics(self):
+        """Current load, counters and wait/run-time percentiles over the last calls"""
+        with self._lock:
+            wait_ms = np.array(self._wait_ms)
+            run_ms = np.array(self._run_ms)
+            metrics = {
+                'workers': self.max_workers,
+                'capacity': self.max_workers + self.max_queue,
+                'running': self._running,
+                'queue_depth': self._in_flight - self._running,
+                'max_queue_depth': self._max_queue_depth,
+                **self._counts,
+            }
+        for name, values in (('wait_ms', wait_ms), ('run_ms', run_ms)):
+            metrics[f'{name}_p50'] = float(np.percentile(values, 50)) if len(values) else None
+            metrics[f'{name}_p99'] = float(np.percentile(values, 99)) if len(values) else None
+        return metrics
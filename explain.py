@@ -0,0 +1,173 @@
+# explain.py - Model explanations
+#
+# Per prediction: Saabas path contributions. Every split on a patient's path
+# through a tree moves the class-1 probability; that change is credited to
+# the split feature. Averaged over the forest: prediction = bias +
+# sum(contributions), exactly. Contributions of one-hot/engineered columns
+# are folded back onto the 11 raw inputs. With a calibration table the bias
+# and prediction are mapped through it (the prediction then equals the
+# calibrated headline probability) and the contributions are rescaled to
+# span the calibrated difference; their split is still the forest's.
+#
+# Global (export time): `python explain.py` precomputes importances and
+# partial-dependence curves (plus permutation importance when a labelled set
+# is given with --data) into models/global_explanations.json so the Info page
+# never touches the forest.
+
+import argparse
+import json
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from scoring import apply_calibration
+from utils import MODELS_DIR, load_models, preprocess_batch, generate_synthetic_patients
+from validation import INPUT_COLUMNS
+from whatif import FIELD_FEATURES, SWEEP_GRIDS, field_feature_indices
+
+GLOBAL_EXPLANATIONS_FILE = 'global_explanations.json'
+
+
+@lru_cache(maxsize=8)
+def _aggregation_matrix(feature_names, original_features):
+    """
+    (n_features, n_inputs) matrix folding encoded columns onto raw inputs
+    A column fed by k raw inputs (e.g. Age_Cholesterol_Interaction, Risk_Score)
+    is split equally between them, so each row sums to 1 and additivity holds.
+    """
+    indices = field_feature_indices(list(feature_names))
+    matrix = np.zeros((len(feature_names), len(original_features)))
+    for j, field in enumerate(original_features):
+        if field in FIELD_FEATURES:
+            matrix[indices[field], j] = 1
+    sources = matrix.sum(axis=1, keepdims=True)
+    return np.divide(matrix, sources, out=np.zeros_like(matrix), where=sources > 0)
+
+
+def aggregation_matrix(feature_names, original_features):
+    return _aggregation_matrix(tuple(feature_names), tuple(original_features))
+
+
+def explain_prediction(compiled, row, feature_names, original_features, calibration=None):
+    """
+    Attribution of one encoded row (output of encode_row)
+    compiled: forest.CompiledForest of the scoring model
+    calibration: lookup table of the model (or None: raw forest probabilities)
+    Returns {'bias', 'prediction', 'contributions' (per raw input),
+             'feature_contributions' (per encoded column)}
+    """
+    leaves = compiled.apply(np.ravel(row))
+    feature_contrib = compiled.contributions(leaves)
+    bias = compiled.bias
+    prediction = bias + float(feature_contrib.sum())
+    if calibration is not None:
+        raw_change = prediction - bias
+        bias, prediction = (float(p) for p in apply_calibration(np.array([bias, prediction]), calibration))
+        # Calibration is monotone, so the rescaled contributions keep their signs
+        feature_contrib = feature_contrib * ((prediction - bias) / raw_change if raw_change else 1.0)
+    input_contrib = feature_contrib @ aggregation_matrix(feature_names, original_features)
+    return {
+        'bias': bias,
+        'prediction': prediction,
+        'contributions': dict(zip(original_features, input_contrib.tolist())),
+        'feature_contributions': dict(zip(feature_names, feature_contrib.tolist())),
+    }
+
+
+def permutation_importance(model, background, y, encode, repeats=5, seed=42):
+    """
+    Drop in ROC-AUC when one raw input is shuffled across the background set
+    (one-hot/engineered columns derived from it are recomputed, not shuffled)
+    """
+    from sklearn.metrics import roc_auc_score  # export time only; keeps app start-up light
+
+    rng = np.random.default_rng(seed)
+    baseline = roc_auc_score(y, model.predict_proba(encode(background))[:, 1])
+    summary = {'metric': 'ROC-AUC', 'baseline': baseline, 'inputs': [], 'mean': [], 'std': []}
+    for col in background.columns:
+        drops = []
+        for _ in range(repeats):
+            shuffled = background.copy()
+            shuffled[col] = rng.permutation(shuffled[col].to_numpy())
+            drops.append(baseline - roc_auc_score(y, model.predict_proba(encode(shuffled))[:, 1]))
+        summary['inputs'].append(col)
+        summary['mean'].append(float(np.mean(drops)))
+        summary['std'].append(float(np.std(drops)))
+    return summary
+
+
+def partial_dependence(model, background, encode, grids=None):
+    """Mean predicted risk over the background set for each grid value of an input"""
+    curves = {}
+    for field, grid in (grids or SWEEP_GRIDS).items():
+        batch = background.loc[background.index.repeat(len(grid))].reset_index(drop=True)
+        batch[field] = np.tile(grid, len(background))
+        proba = model.predict_proba(encode(batch))[:, 1].reshape(len(background), len(grid))
+        curves[field] = {'grid': np.asarray(grid).tolist(), 'mean': proba.mean(axis=0).tolist()}
+    return curves
+
+
+def build_global_explanations(models_dict, background=None, y=None, repeats=5, source='supplied'):
+    """
+    Precompute the Info page explanations
+    background: raw inputs DataFrame with labels y (synthetic cohort if None)
+    Permutation importance needs real labels: without them it would only
+    measure how much the model agrees with itself, so it is left out (None).
+    """
+    model = models_dict['champion_model']
+    encode = lambda df: preprocess_batch(df, models_dict['scaler'], models_dict['label_tables'],
+                                         models_dict['feature_names'])
+    if background is None:
+        background = generate_synthetic_patients(1000, models_dict['scaler'], seed=2024)
+        y = None
+        source = f'synthetic (n={len(background)}, no labels)'
+
+    importances = models_dict['rf_model'].feature_importances_
+    order = np.argsort(importances)[::-1]
+    return {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'background': source,
+        'feature_importances': {
+            'model': 'rf_model',
+            'names': [models_dict['feature_names'][i] for i in order],
+            'values': importances[order].tolist(),
+        },
+        'permutation_importance': (permutation_importance(model, background, y, encode, repeats)
+                                   if y is not None else None),
+        'partial_dependence': partial_dependence(model, background, encode),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export global explanation artifacts")
+    parser.add_argument('--data', default=None,
+                        help="CSV/Parquet background set with HeartDisease column (default: "
+                             "synthetic, without permutation importance)")
+    parser.add_argument('--repeats', type=int, default=5, help="Permutation repeats per input")
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    args = parser.parse_args()
+
+    models_dict = load_models()
+    if models_dict is None:
+        raise SystemExit(1)
+
+    background, y = None, None
+    if args.data:
+        background = pd.read_parquet(args.data) if args.data.endswith('.parquet') else pd.read_csv(args.data)
+        y = background.pop('HeartDisease').to_numpy().astype(int)
+        background = background[INPUT_COLUMNS]
+
+    start = time.perf_counter()
+    explanations = build_global_explanations(models_dict, background, y, args.repeats, args.data)
+    path = os.path.join(args.output_dir, GLOBAL_EXPLANATIONS_FILE)
+    with open(path, 'w') as f:
+        json.dump(explanations, f, indent=1)
+    print(f"\n💾 Saved {path} ({os.path.getsize(path)/1024:.1f} KB, "
+          f"{time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# forest.py - Flattened view of a fitted RandomForestClassifier
+#
+# Exposes each tree's arrays (children, split feature, threshold, class-1
+# probability per node) so single rows can be routed through a chosen subset
+# of trees without going through sklearn's per-call validation and joblib.
+# Also holds the per-node path contributions used for Saabas attributions.
+
+from functools import cached_property
+
+import numpy as np
+
+
+class CompiledForest:
+    """
+    Per-tree node arrays of a fitted forest (class-1 probability per node)
+    Traversal follows sklearn: inputs are compared as float32, `x <= threshold` goes left
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.n_trees = len(forest.estimators_)
+        self.n_features = forest.n_features_in_
+        positive = list(forest.classes_).index(1)
+
+        self.left, self.right, self.feature, self.threshold = [], [], [], []
+        self.node_proba = []
+        self.uses_feature = np.zeros((self.n_trees, self.n_features), dtype=bool)
+
+        for t, estimator in enumerate(forest.estimators_):
+            tree = estimator.tree_
+            value = tree.value[:, 0, :]
+            self.left.append(tree.children_left.tolist())
+            self.right.append(tree.children_right.tolist())
+            self.feature.append(tree.feature.tolist())
+            self.threshold.append(tree.threshold.tolist())
+            self.node_proba.append(value[:, positive] / value.sum(axis=1))
+            split_features = tree.feature[tree.children_left >= 0]
+            self.uses_feature[t, split_features] = True
+
+    @staticmethod
+    def as_float32_row(row):
+        """Round a 1-D row to float32 like sklearn does, as a Python list"""
+        return np.asarray(row, dtype=np.float32).ravel().astype(float).tolist()
+
+    def leaf(self, t, row):
+        """Leaf node reached by `row` (float32-rounded list) in tree t"""
+        left, right = self.left[t], self.right[t]
+        feature, threshold = self.feature[t], self.threshold[t]
+        node = 0
+        while left[node] >= 0:
+            node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+        return node
+
+    def apply(self, row, trees=None):
+        """Leaf node per tree (all trees, or only the given tree indices)"""
+        row = self.as_float32_row(row)
+        trees = range(self.n_trees) if trees is None else trees
+        return [self.leaf(t, row) for t in trees]
+
+    def leaf_proba(self, leaves):
+        """Class-1 probability of each tree given its leaf (leaves for all trees)"""
+        return np.array([self.node_proba[t][leaf] for t, leaf in enumerate(leaves)])
+
+    def trees_using(self, feature_indices):
+        """Indices of the trees that split on any of the given features"""
+        if len(feature_indices) == 0:
+            return np.array([], dtype=int)
+        return np.flatnonzero(self.uses_feature[:, feature_indices].any(axis=1))
+
+    @cached_property
+    def node_offsets(self):
+        """Start of each tree's nodes in the concatenated node arrays"""
+        sizes = [len(p) for p in self.node_proba]
+        return np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+
+    @cached_property
+    def node_contributions(self):
+        """
+        Saabas path contributions, all trees concatenated: (total nodes, n_features)
+        Row = sum over the root->node path of (proba[child] - proba[parent]),
+        credited to the parent's split feature. Built level by level.
+        """
+        blocks = []
+        for t in range(self.n_trees):
+            left = np.asarray(self.left[t])
+            right = np.asarray(self.right[t])
+            feature = np.asarray(self.feature[t])
+            proba = self.node_proba[t]
+            contrib = np.zeros((len(proba), self.n_features))
+
+            level = np.array([0])
+            while len(level):
+                parents = level[left[level] >= 0]
+                for children in (left[parents], right[parents]):
+                    contrib[children] = contrib[parents]
+                    contrib[children, feature[parents]] += proba[children] - proba[parents]
+                level = np.concatenate([left[parents], right[parents]])
+            blocks.append(contrib)
+        return np.vstack(blocks)
+
+    @cached_property
+    def bias(self):
+        """Expected value: mean class-1 probability at the tree roots"""
+        return float(np.mean([p[0] for p in self.node_proba]))
+
+    def contributions(self, leaves):
+        """Per-feature contributions for one row, given its leaf in every tree"""
+        return self.node_contributions[self.node_offsets + np.asarray(leaves)].mean(axis=0)
@@ -0,0 +1,266 @@
+# loadtest.py - Headless load test of streamlit_app.py
+#
+# Simulated users walk Home -> Check -> steps 1-4 -> results, then move a
+# what-if slider and switch the risk curve, through Streamlit's testing API
+# (AppTest). No browser, server or external service is needed. All sessions
+# run in this process and share st.cache_resource (models, scoring
+# executor, ...) exactly like the sessions of one server. Every AppTest.run()
+# is one interaction: the script rerun the server would do for that click.
+#
+# AppTest swaps a process-global runtime in and out on every run, so reruns
+# of different sessions cannot overlap: they are serialized by a lock, like
+# a server whose reruns are bound to one core. Background work (model
+# loading, scoring executor, shadow/audit threads) still runs concurrently.
+# Each interaction therefore reports latency (including the wait for the
+# lock, i.e. contention with the other users), service time (the rerun
+# alone) and the process CPU used during the rerun.
+#
+# Also recorded: busy/failed sessions, CPU per session and RSS (sampled;
+# baseline after one warm-up session, peak, growth per live session). The
+# JSON report carries the git commit, so runs can be compared across commits:
+#   python loadtest.py --sessions 50 --concurrency 10 --output before.json
+#   python loadtest.py --sessions 50 --concurrency 10 --output after.json
+#   python loadtest.py --compare before.json after.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+_RERUN_LOCK = threading.Lock()  # see above: one AppTest.run() at a time
+INTERACTIONS = ['home', 'open_check', 'step1', 'step2', 'step3', 'analyse', 'whatif', 'risk_curve']
+
+
+def rss_mb():
+    """Current resident set size (Linux /proc; peak RSS elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemorySampler:
+    """Background RSS sampling (peak between start and stop)"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def simulate_session(seed, think_s=0.0, timeout=120):
+    """
+    One user through the wizard; returns {'latency_ms', 'service_ms', 'cpu_ms'
+    (each {interaction: ms}), 'busy', 'error', 'app'} (the AppTest is kept so
+    the session stays alive until the end of the test)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    latency, service, cpu = {}, {}, {}
+
+    def step(name, action=None):
+        if action is not None:
+            action()
+        if think_s:
+            time.sleep(rng.exponential(think_s))
+        requested = time.perf_counter()
+        with _RERUN_LOCK:
+            started, cpu_start = time.perf_counter(), time.process_time()
+            at.run()
+            cpu[name] = (time.process_time() - cpu_start) * 1000
+        finished = time.perf_counter()
+        latency[name] = (finished - requested) * 1000
+        service[name] = (finished - started) * 1000
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+
+    def button(label):
+        return lambda: next(b for b in at.button if b.label == label).click()
+
+    def number(label, value):
+        next(w for w in at.number_input if w.label == label).set_value(value)
+
+    try:
+        step('home')
+        step('open_check', button("🩺 Check"))
+        number("Usia (tahun)", int(rng.integers(25, 80)))
+        step('step1', button("Lanjut ke Langkah 2 →"))
+        step('step2', button("Lanjut ke Langkah 3 →"))
+        number("Tekanan Darah (mm Hg)", int(rng.integers(90, 180)))
+        number("Kolesterol Total (mg/dl)", int(rng.integers(150, 350)))
+        number("Detak Jantung Maksimal", int(rng.integers(90, 200)))
+        step('step3', button("Lanjut ke Review →"))
+        step('analyse', button("🔍 Analisis Sekarang"))
+        busy = any('sibuk' in w.value for w in at.warning)
+        if not busy:
+            step('whatif', lambda: at.slider[0].set_value(int(rng.integers(150, 300))))
+            step('risk_curve', lambda: next(s for s in at.selectbox if s.label.startswith("Lihat perubahan"))
+                 .set_value('MaxHR'))
+        error = None
+    except Exception as e:
+        busy, error = False, f"{type(e).__name__}: {e}"
+    return {'latency_ms': latency, 'service_ms': service, 'cpu_ms': cpu,
+            'busy': busy, 'error': error, 'app': at}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(APP_PATH),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(values):
+    values = np.asarray(values)
+    if not len(values):
+        return None
+    return {'n': int(len(values)), 'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)), 'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max())}
+
+
+def interaction_stats(results, name):
+    """Latency percentiles plus median service time and CPU of one interaction type"""
+    done = [r for r in results if name in r['latency_ms']]
+    stats = summarize([r['latency_ms'][name] for r in done])
+    if stats:
+        stats['service_p50_ms'] = float(np.median([r['service_ms'][name] for r in done]))
+        stats['cpu_p50_ms'] = float(np.median([r['cpu_ms'][name] for r in done]))
+    return stats
+
+
+def run_load_test(sessions, concurrency, think_s=0.0, seed=0):
+    """Warm-up session, then `sessions` users with `concurrency` at a time; returns the report"""
+    warm = simulate_session([seed, sessions])  # loads + warms the models, fills the caches
+    if warm['error']:
+        raise SystemExit(f"❌ Warm-up session failed: {warm['error']}")
+    baseline_mb = rss_mb()
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with MemorySampler() as memory:
+        with ThreadPoolExecutor(max_workers=concurrency) as users:
+            results = list(users.map(lambda i: simulate_session([seed, i], think_s), range(sessions)))
+    elapsed = time.perf_counter() - start
+    cpu_s = time.process_time() - cpu_start
+    final_mb = rss_mb()
+
+    errors = [r['error'] for r in results if r['error']]
+    return {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'config': {'sessions': sessions, 'concurrency': concurrency, 'think_s': think_s,
+                   'seed': seed, 'cpus': os.cpu_count()},
+        'interactions': {name: interaction_stats(results, name) for name in INTERACTIONS},
+        'sessions': {'completed': sum(not r['error'] and not r['busy'] for r in results),
+                     'busy': sum(r['busy'] for r in results), 'failed': len(errors),
+                     'errors': sorted(set(errors))[:5]},
+        'elapsed_s': elapsed,
+        'sessions_per_s': sessions / elapsed,
+        'cpu': {'process_s': cpu_s, 'per_session_s': cpu_s / sessions,
+                'reruns_per_session_s': summarize([sum(r['cpu_ms'].values()) for r in results]),
+                'utilization': cpu_s / elapsed / (os.cpu_count() or 1)},
+        'memory': {'baseline_mb': baseline_mb, 'peak_mb': memory.peak, 'final_mb': final_mb,
+                   'per_session_mb': (final_mb - baseline_mb) / sessions},
+    }
+
+
+def print_report(report):
+    config = report['config']
+    print("\n" + "="*70)
+    print(f"🧪 LOAD TEST ({config['sessions']} sessions, {config['concurrency']} concurrent, "
+          f"commit {report['commit']})")
+    print("="*70)
+    print(f"{'interaction':<14}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'rerun ms':>10}{'cpu ms':>9}")
+    for name, stats in report['interactions'].items():
+        if stats:
+            print(f"{name:<14}{stats['n']:>5}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}"
+                  f"{stats['p99_ms']:>9.0f}{stats['max_ms']:>9.0f}"
+                  f"{stats['service_p50_ms']:>10.0f}{stats['cpu_p50_ms']:>9.0f}")
+    sessions, cpu, memory = report['sessions'], report['cpu'], report['memory']
+    print(f"\n👥 {sessions['completed']} completed, {sessions['busy']} busy, {sessions['failed']} failed "
+          f"in {report['elapsed_s']:.1f}s ({report['sessions_per_s']:.2f} sessions/s)")
+    for error in sessions['errors']:
+        print(f"   ❌ {error}")
+    print(f"⚙️ CPU {cpu['process_s']:.1f}s ({cpu['per_session_s']*1000:.0f} ms/session, "
+          f"{cpu['utilization']*100:.0f}% of {config['cpus']} CPU)")
+    print(f"💾 RSS baseline {memory['baseline_mb']:.0f} MB, peak {memory['peak_mb']:.0f} MB, "
+          f"final {memory['final_mb']:.0f} MB ({memory['per_session_mb']:.2f} MB/session)")
+    print("="*70)
+
+
+def print_comparison(before, after):
+    print(f"\n📊 {before['commit']} → {after['commit']}")
+    print(f"{'interaction':<14}{'p50 ms':>20}{'p95 ms':>20}{'rerun p50 ms':>20}")
+    for name in INTERACTIONS:
+        a, b = before['interactions'].get(name), after['interactions'].get(name)
+        if a and b:
+            cells = [f"{a[k]:.0f} → {b[k]:.0f} ({(b[k] / a[k] - 1) * 100:+.0f}%)"
+                     for k in ('p50_ms', 'p95_ms', 'service_p50_ms')]
+            print(f"{name:<14}{cells[0]:>20}{cells[1]:>20}{cells[2]:>20}")
+    for label, key, sub in (('CPU ms/session', 'cpu', 'per_session_s'),
+                            ('RSS MB/session', 'memory', 'per_session_mb'),
+                            ('RSS peak MB', 'memory', 'peak_mb')):
+        a, b = before[key][sub], after[key][sub]
+        scale = 1000 if sub == 'per_session_s' else 1
+        print(f"{label:<16}{a*scale:>10.1f} → {b*scale:.1f}")
+    print(f"{'sessions/s':<16}{before['sessions_per_s']:>10.2f} → {after['sessions_per_s']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load test of the Streamlit app")
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--think', type=float, default=0.0, help="Mean pause (s) before each interaction")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report here")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.load(open(path)) for path in args.compare)
+        print_comparison(before, after)
+        return
+
+    warnings.filterwarnings('ignore')
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')  # per-rerun deprecation notices
+    with contextlib.redirect_stdout(io.StringIO()):  # model loading banners, registry logs
+        report = run_load_test(args.sessions, args.concurrency, args.think, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"💾 Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+# pruning.py - Forest pruning / distillation for a faster champion model
+#
+# Usage:
+#   python pruning.py --validation data.csv            # greedy pruning, labelled set (HeartDisease)
+#   python pruning.py                                  # no labels: synthetic set, fidelity criterion
+#   python pruning.py --method distill --n-trees 20    # distill into a smaller forest
+#
+# Acceptance criterion: with real labels, no metric (accuracy, precision,
+# recall, ROC-AUC) may drop more than --tolerance below the champion; without
+# labels, the fast model must agree with the champion's decision on at least
+# --min-agreement of the synthetic patients (fidelity, not accuracy).
+#
+# Output: models/fast_model.pkl + models/fast_model_metadata.pkl (latency, size,
+# metric deltas / fidelity). Nothing is written when the criterion is not met
+# on the held-out half or the forest did not get smaller (--force overrides
+# the former).
+
+import argparse
+import copy
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score
+
+from utils import MODELS_DIR, load_models, preprocess_batch, generate_synthetic_patients
+from validation import InputSchema
+
+FAST_MODEL_FILE = 'fast_model.pkl'
+FAST_METADATA_FILE = 'fast_model_metadata.pkl'
+
+
+def compute_metrics(y_true, proba):
+    """Same metrics as model_metadata.pkl (accuracy, precision, recall, ROC-AUC)"""
+    y_pred = (proba > 0.5).astype(int)  # ties go to class 0, like predict()
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'precision': precision_score(y_true, y_pred, zero_division=0),
+        'recall': recall_score(y_true, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_true, proba) if len(np.unique(y_true)) > 1 else 1.0,
+    }
+
+
+def compute_fidelity(reference_proba, proba):
+    """Agreement with the reference model's decisions and mean |Δ probability| (no labels needed)"""
+    return {
+        'agreement': float(np.mean((proba > 0.5) == (reference_proba > 0.5))),
+        'mean_abs_delta': float(np.mean(np.abs(proba - reference_proba))),
+    }
+
+
+def within_tolerance(metrics, reference, tolerance):
+    """True if no metric dropped more than `tolerance` below the reference"""
+    return all(reference[k] - metrics[k] <= tolerance for k in reference)
+
+
+def subset_forest(forest, tree_indices):
+    """Build a RandomForestClassifier holding only the selected trees"""
+    pruned = copy.copy(forest)
+    pruned.estimators_ = [forest.estimators_[i] for i in tree_indices]
+    pruned.n_estimators = len(pruned.estimators_)
+    return pruned
+
+
+def greedy_prune(forest, X, y=None, tolerance=0.01, max_trees=None, margin=0.5, min_agreement=0.95):
+    """
+    Forward greedy tree selection: each step adds the tree that brings the
+    averaged probability closest to the full forest, and stops as soon as the
+    subset is close enough to the full forest: all metrics within
+    `tolerance * margin` (labels y), or decision agreement of at least
+    1 - (1 - min_agreement) * margin (y None). The margin leaves headroom for
+    the held-out evaluation.
+    Returns (forest, met): met is False if no subset up to max_trees was close enough.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    tree_proba = np.stack([tree.predict_proba(X)[:, 1] for tree in forest.estimators_])
+    full_proba = tree_proba.mean(axis=0)
+    if y is None:
+        target = 1 - (1 - min_agreement) * margin
+        close_enough = lambda proba: compute_fidelity(full_proba, proba)['agreement'] >= target
+    else:
+        reference = compute_metrics(y, full_proba)
+        close_enough = lambda proba: within_tolerance(compute_metrics(y, proba), reference,
+                                                      tolerance * margin)
+
+    max_trees = max_trees or len(forest.estimators_)
+    selected = []
+    remaining = list(range(len(forest.estimators_)))
+    running_sum = np.zeros_like(full_proba)
+
+    met = False
+    while remaining and len(selected) < max_trees:
+        k = len(selected) + 1
+        candidates = (running_sum + tree_proba[remaining]) / k
+        errors = ((candidates - full_proba) ** 2).mean(axis=1)
+        best = remaining.pop(int(np.argmin(errors)))
+        selected.append(best)
+        running_sum += tree_proba[best]
+
+        if close_enough(running_sum / k):
+            met = True
+            break
+
+    return subset_forest(forest, sorted(selected)), met
+
+
+def distill_forest(forest, X_transfer, n_trees, max_depth=10, random_state=42):
+    """
+    Train a smaller, shallower forest (otherwise same hyperparameters) on the
+    champion's own predictions for a large transfer set
+    """
+    student = RandomForestClassifier(**forest.get_params())
+    student.set_params(n_estimators=n_trees, max_depth=max_depth, random_state=random_state)
+    y_teacher = forest.predict(X_transfer)
+    student.fit(pd.DataFrame(X_transfer, columns=forest.feature_names_in_), y_teacher)
+    return student
+
+
+def measure_latency(model, X, repeats=50):
+    """Median single-row and batch predict_proba latency (ms)"""
+    X = pd.DataFrame(X, columns=model.feature_names_in_)
+    single, batch = [], []
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(X.iloc[[i % len(X)]])
+        single.append(time.perf_counter() - start)
+    for _ in range(max(repeats // 10, 3)):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        batch.append(time.perf_counter() - start)
+    return {
+        'single_row_ms': float(np.median(single) * 1000),
+        'batch_ms': float(np.median(batch) * 1000),
+        'batch_rows': len(X),
+    }
+
+
+def model_size(model):
+    """Serialized size (bytes) and total node count of a forest"""
+    return {
+        'size_bytes': len(pickle.dumps(model)),
+        'n_trees': len(model.estimators_),
+        'n_nodes': int(sum(tree.tree_.node_count for tree in model.estimators_)),
+    }
+
+
+def build_report(champion, fast_model, X_val, y_val, method, tolerance, min_agreement,
+                 validation_source):
+    """
+    Latency, size, fidelity and (with labels) metric deltas of the fast model
+    vs the champion; 'accepted' tells whether the criterion was met
+    """
+    X_frame = pd.DataFrame(X_val, columns=champion.feature_names_in_)
+    champion_proba = champion.predict_proba(X_frame)[:, 1]
+    fast_proba = fast_model.predict_proba(X_frame)[:, 1]
+    fidelity = compute_fidelity(champion_proba, fast_proba)
+    if y_val is None:
+        champion_metrics = fast_metrics = None
+        accepted = fidelity['agreement'] >= min_agreement
+    else:
+        champion_metrics = compute_metrics(y_val, champion_proba)
+        fast_metrics = compute_metrics(y_val, fast_proba)
+        accepted = within_tolerance(fast_metrics, champion_metrics, tolerance)
+    champion_latency = measure_latency(champion, X_val)
+    fast_latency = measure_latency(fast_model, X_val)
+    champion_size = model_size(champion)
+    fast_size = model_size(fast_model)
+
+    return {
+        'method': method,
+        'criterion': 'fidelity' if y_val is None else 'metrics',
+        'tolerance': tolerance,
+        'min_agreement': min_agreement,
+        'validation_source': validation_source,
+        'validation_rows': len(X_val),
+        'champion_metrics': champion_metrics,
+        'fast_metrics': fast_metrics,
+        'metric_deltas': ({k: fast_metrics[k] - champion_metrics[k] for k in champion_metrics}
+                          if champion_metrics else None),
+        'fidelity': fidelity,
+        'accepted': accepted,
+        'champion_latency': champion_latency,
+        'fast_latency': fast_latency,
+        'champion_size': champion_size,
+        'fast_size': fast_size,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def print_report(report):
+    """Pretty-print a pruning report"""
+    print("\n" + "="*70)
+    criterion = (f"tolerance={report['tolerance']}" if report['criterion'] == 'metrics'
+                 else f"min agreement={report['min_agreement']}")
+    print(f"⚡ FAST MODEL REPORT ({report['method']}, {criterion})")
+    print("="*70)
+    print(f"📋 Validation: {report['validation_source']} ({report['validation_rows']} rows)")
+    print(f"\n🌲 Trees: {report['champion_size']['n_trees']} → {report['fast_size']['n_trees']}")
+    print(f"   Nodes: {report['champion_size']['n_nodes']} → {report['fast_size']['n_nodes']}")
+    print(f"   Size:  {report['champion_size']['size_bytes']/1024:.0f} KB → "
+          f"{report['fast_size']['size_bytes']/1024:.0f} KB")
+    print(f"\n⏱️ Single row: {report['champion_latency']['single_row_ms']:.2f} ms → "
+          f"{report['fast_latency']['single_row_ms']:.2f} ms")
+    print(f"   Batch ({report['fast_latency']['batch_rows']} rows): "
+          f"{report['champion_latency']['batch_ms']:.2f} ms → {report['fast_latency']['batch_ms']:.2f} ms")
+    if report['metric_deltas']:
+        print("\n📊 Metrics (champion → fast, delta):")
+        for key, delta in report['metric_deltas'].items():
+            print(f"   • {key:<10} {report['champion_metrics'][key]:.4f} → "
+                  f"{report['fast_metrics'][key]:.4f} ({delta:+.4f})")
+    else:
+        print("\n📊 No labels: fidelity to the champion only (says nothing about accuracy)", end='')
+    print(f"\n🔁 Fidelity: agreement {report['fidelity']['agreement']*100:.1f}%, "
+          f"mean |Δ probability| {report['fidelity']['mean_abs_delta']:.4f}")
+    if report['accepted']:
+        status = "✅ Within tolerance" if report['criterion'] == 'metrics' else "✅ Agreement reached"
+    else:
+        status = "⚠️ Outside tolerance" if report['criterion'] == 'metrics' else "⚠️ Agreement too low"
+    print(f"\n{status}")
+    print("="*70)
+
+
+def load_validation_set(models_dict, path=None, n_synthetic=4000, seed=123):
+    """
+    Returns (X, y, source). A supplied CSV/Parquet must contain the 11 raw
+    inputs plus a HeartDisease column; otherwise a synthetic set without
+    labels is returned (y None: only fidelity to the champion can be measured).
+    """
+    args = (models_dict['scaler'], models_dict['label_tables'], models_dict['feature_names'])
+    if path:
+        df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+        y = df.pop('HeartDisease').to_numpy().astype(int)
+        result = InputSchema.from_models(models_dict).validate(df)
+        if result.n_invalid:
+            print(f"⚠️ Skipping {result.n_invalid} invalid row(s) in {path}")
+        return preprocess_batch(result.data[result.valid], *args), y[result.valid], path
+
+    df = generate_synthetic_patients(n_synthetic, models_dict['scaler'], seed=seed)
+    return preprocess_batch(df, *args), None, f'synthetic (n={n_synthetic}, seed={seed}, no labels)'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune or distill the champion forest")
+    parser.add_argument('--method', choices=['greedy', 'distill'], default='greedy')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Max allowed drop per metric vs champion (labelled validation set)")
+    parser.add_argument('--min-agreement', type=float, default=0.95,
+                        help="Min share of champion decisions reproduced (no labels)")
+    parser.add_argument('--max-trees', type=int, default=None, help="Upper bound for greedy pruning")
+    parser.add_argument('--n-trees', type=int, default=20, help="Student size for distillation")
+    parser.add_argument('--max-depth', type=int, default=10, help="Student depth for distillation")
+    parser.add_argument('--validation', default=None, help="CSV/Parquet with HeartDisease column")
+    parser.add_argument('--n-synthetic', type=int, default=4000)
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    parser.add_argument('--force', action='store_true', help="Save even if the criterion is not met")
+    args = parser.parse_args()
+
+    models_dict = load_models()
+    if models_dict is None:
+        raise SystemExit(1)
+    champion = models_dict['champion_model']
+
+    # Selection and evaluation use disjoint halves
+    X, y, source = load_validation_set(models_dict, args.validation, args.n_synthetic)
+    half = len(X) // 2
+    X_select, X_val = X[:half], X[half:]
+    y_select, y_val = (None, None) if y is None else (y[:half], y[half:])
+
+    if args.method == 'greedy':
+        fast_model, met = greedy_prune(champion, X_select, y_select, args.tolerance, args.max_trees,
+                                       min_agreement=args.min_agreement)
+        if not met:
+            print(f"⚠️ No subset of up to {len(fast_model.estimators_)} trees met the criterion "
+                  f"on the selection half")
+    else:
+        transfer_df = generate_synthetic_patients(20000, models_dict['scaler'], seed=7)
+        X_transfer = preprocess_batch(transfer_df, models_dict['scaler'],
+                                      models_dict['label_tables'], models_dict['feature_names'])
+        fast_model = distill_forest(champion, X_transfer, args.n_trees, args.max_depth)
+    fast_model.n_jobs = 1  # small forests are faster without joblib dispatch
+
+    report = build_report(champion, fast_model, X_val, y_val, args.method, args.tolerance,
+                          args.min_agreement, source)
+    print_report(report)
+
+    if report['fast_size']['n_trees'] >= report['champion_size']['n_trees']:
+        raise SystemExit(f"❌ The fast model is not smaller than the champion "
+                         f"({report['fast_size']['n_trees']} trees): nothing saved")
+    if not report['accepted'] and not args.force:
+        raise SystemExit("❌ Criterion not met on the held-out half: nothing saved "
+                         "(loosen --tolerance/--min-agreement or use --force)")
+
+    joblib.dump(fast_model, os.path.join(args.output_dir, FAST_MODEL_FILE))
+    joblib.dump(report, os.path.join(args.output_dir, FAST_METADATA_FILE))
+    print(f"\n💾 Saved {FAST_MODEL_FILE} and {FAST_METADATA_FILE} to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# registry.py - Versioned model registry with hot reload
+#
+# Watches models/ (or models/manifest.json when present) and, when its
+# fingerprint changes and stays stable for one poll, loads the new files in
+# a background thread, warms them (synthetic patients through the whole
+# results path, see warm_up) and swaps them in with a single reference
+# assignment. The first load also runs in the background (start()), so the
+# app can render pages that need no model while it is in progress; it is
+# warmed the same way before `ready` is set, so the first request costs
+# what later ones do. Callers take one snapshot per request
+# (registry.current()) and use it throughout, so in-flight predictions
+# finish on the version they started with. Previous versions are kept for
+# rollback(), available on the Info page when MODEL_ADMIN=1.
+#
+# Poll interval: MODEL_RELOAD_INTERVAL seconds (default 5, 0 disables watching).
+
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+
+from executor import limit_intra_op_threads, threads_per_call
+from explain import explain_prediction
+from forest import CompiledForest
+from scoring import predict_proba, score_patient
+from utils import (
+    MODELS_DIR, INPUT_LABELS, load_models, encode_row, preprocess_batch,
+    generate_synthetic_patients, calculate_risk_factors, get_health_recommendations,
+    create_gauge_chart, create_rf_prediction_chart, create_contribution_chart, create_sweep_chart
+)
+from whatif import sweep
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def admin_enabled():
+    return os.environ.get('MODEL_ADMIN', '0').lower() in ('1', 'true', 'yes')
+
+
+def models_fingerprint(models_dir=MODELS_DIR):
+    """
+    Checksum of the manifest if there is one, else of every file's name, size
+    and mtime (cheap enough to poll every few seconds)
+    """
+    digest = hashlib.sha256()
+    manifest = os.path.join(models_dir, MANIFEST_FILE)
+    if os.path.exists(manifest):
+        with open(manifest, 'rb') as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+    for entry in sorted(os.scandir(models_dir), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def run_results_path(models_dict, input_data):
+    """
+    What one "Analisis" click computes: scoring, attribution, risk curve,
+    charts (serialized like Streamlit does) and recommendations
+    """
+    scored = score_patient(models_dict, input_data)
+    row = encode_row(input_data, models_dict['scaler'], models_dict['label_tables'],
+                     models_dict['feature_names'])
+    explanation = explain_prediction(models_dict['compiled_forest'], row,
+                                     models_dict['feature_names'], models_dict['original_features'],
+                                     calibration=models_dict['calibration'])
+    grid, curve = sweep(input_data, 'Age', None, models_dict)
+    risk_factors = calculate_risk_factors(input_data)
+    figures = [
+        create_gauge_chart(scored['probability'], "Probabilitas"),
+        create_rf_prediction_chart(scored['probability']),
+        create_contribution_chart(explanation['contributions']),
+        create_sweep_chart(grid, curve, INPUT_LABELS['Age'], input_data['Age'], scored['probability']),
+    ]
+    for fig in figures:
+        fig.to_json()
+    get_health_recommendations(scored['prediction'], scored['probability'], risk_factors)
+    return scored
+
+
+def warm_up(models_dict, n_patients=8, batch_size=64):
+    """
+    Pay the one-off costs (lazy sklearn/joblib setup, first-time NumPy/pandas
+    paths, Plotly templates, contribution tables) before the version goes live
+    """
+    df = generate_synthetic_patients(max(batch_size, n_patients), models_dict['scaler'], seed=0)
+    X = preprocess_batch(df, models_dict['scaler'], models_dict['label_tables'],
+                         models_dict['feature_names'])
+    predict_proba(models_dict, X)
+    models_dict['compiled_forest'].node_contributions
+    for input_data in df.head(n_patients).to_dict('records'):
+        run_results_path(models_dict, input_data)
+
+
+class ModelRegistry:
+    """
+    Holds the active models_dict plus the previous versions
+    Every models_dict it hands out has a 'model_version' key ('v<n>-<fingerprint>')
+    and a warmed 'compiled_forest' (forest.CompiledForest of the scoring model)
+    models_dir: directory to watch (the one load_models reads)
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, poll_interval=None, keep=3):
+        if poll_interval is None:
+            poll_interval = float(os.environ.get('MODEL_RELOAD_INTERVAL', 5))
+        self.models_dir = models_dir
+        self.poll_interval = poll_interval
+        self.history = deque(maxlen=keep)  # previous versions, newest last
+        self.last_error = None
+        self.stage = 'idle'  # idle -> loading -> warming -> ready | failed
+        self.ready = threading.Event()  # set once the first load finished (or failed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counter = 0
+        self._current = None
+        self._seen = models_fingerprint(models_dir)
+        self._candidate = self._seen
+
+    def current(self):
+        """Active models_dict (None while the first load runs or if it failed)"""
+        return self._current
+
+    def wait(self, timeout=None):
+        """Block until the first load finished; returns False on timeout"""
+        return self.ready.wait(timeout)
+
+    @property
+    def progress(self):
+        """Rough fraction of the first load done (loading and warming take about half each)"""
+        return {'idle': 0.0, 'loading': 0.1, 'warming': 0.5}.get(self.stage, 1.0)
+
+    def _load(self, fingerprint):
+        """Load, warm and swap in the files on disk; keeps the old version on failure"""
+        start = time.perf_counter()
+        initial = self._current is None
+        if initial:
+            self.stage = 'loading'
+        models_dict = load_models(models_dir=self.models_dir)
+        if models_dict is None:
+            self.last_error = f"load failed for {fingerprint[:8]}"
+            print(f"❌ Model reload failed, keeping {self._version_name()}")
+            if initial:
+                self.stage = 'failed'
+            return False
+        with self._lock:
+            self._counter += 1
+            # Named before warm-up: the sweep caches are keyed on the version
+            models_dict['model_version'] = f"v{self._counter}-{fingerprint[:8]}"
+        try:
+            if initial:
+                self.stage = 'warming'
+            limit_intra_op_threads(models_dict, threads_per_call())
+            models_dict['compiled_forest'] = CompiledForest(models_dict['scoring_model'])
+            warm_up(models_dict)
+        except Exception as e:
+            self.last_error = f"warm-up failed for {fingerprint[:8]}: {e}"
+            print(f"❌ Warm-up failed ({e}), keeping {self._version_name()}")
+            if initial:
+                self.stage = 'failed'
+            return False
+
+        with self._lock:
+            models_dict['loaded_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            if self._current is not None:
+                self.history.append(self._current)
+            self._current = models_dict
+        self.stage = 'ready'
+        self.last_error = None
+        print(f"🔁 Model version {models_dict['model_version']} active "
+              f"(loaded + warmed in {time.perf_counter() - start:.1f}s)")
+        return True
+
+    def _version_name(self):
+        return self._current['model_version'] if self._current else 'no model'
+
+    def poll(self):
+        """
+        Check the fingerprint once; reload when a change has been stable for
+        one poll (so half-copied files are not picked up)
+        """
+        fingerprint = models_fingerprint(self.models_dir)
+        if fingerprint == self._seen:
+            self._candidate = fingerprint
+            return False
+        if fingerprint != self._candidate:
+            self._candidate = fingerprint
+            return False
+        self._seen = fingerprint
+        return self._load(fingerprint)
+
+    def _run(self):
+        try:
+            self._load(self._seen)
+        except Exception as e:
+            self.last_error = str(e)
+            self.stage = 'failed'
+        finally:
+            self.ready.set()
+        if self.poll_interval <= 0:
+            return
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+
+    def start(self):
+        """
+        Load the current files on a background thread, then keep watching
+        (unless the interval is 0). Returns immediately; see wait()/ready.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def rollback(self):
+        """Swap the previous version back in; returns its name (None if there is none)"""
+        with self._lock:
+            if not self.history:
+                return None
+            self._current = self.history.pop()
+        print(f"↩️ Rolled back to model version {self._current['model_version']}")
+        return self._current['model_version']
+
+    def versions(self):
+        """[{'version', 'loaded_at', 'active'}] oldest first"""
+        with self._lock:
+            snapshot = list(self.history) + ([self._current] if self._current else [])
+        return [{'version': m['model_version'], 'loaded_at': m['loaded_at'],
+                 'active': m is self._current} for m in snapshot]
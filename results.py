@@ -0,0 +1,82 @@
+# results.py - Static HTML of the results page, built once per prediction
+#
+# The banner, spacers, risk-factor badges and recommendation cards used to
+# be a dozen separate st.markdown calls, each one its own delta message over
+# the websocket on every rerun. Here they are filled into templates compiled
+# at import time (recommendation cards are pre-rendered per template ID)
+# and joined into two blocks, one above and one below the interactive
+# charts. Both are cached per displayed values, so a rerun resends two
+# cached strings.
+
+import re
+from functools import lru_cache
+from string import Template
+
+from utils import RECOMMENDATION_TEMPLATES, recommendation_mask
+
+SPACER = "<div style='margin: {}rem 0;'></div>"
+
+BANNER_TEMPLATE = Template(
+    '<div class="result-banner $css">'
+    '<div class="result-icon-large">$icon</div>'
+    '<h1>$title</h1>'
+    '<p>Berdasarkan data yang dianalisis, Anda memiliki $level terkena penyakit jantung</p>'
+    '<div class="probability-badge">Tingkat Risiko: $probability%</div>'
+    '</div>'
+)
+BANNERS = {
+    0: {'css': 'result-positive', 'icon': '💚', 'title': 'Risiko Rendah', 'level': 'risiko rendah'},
+    1: {'css': 'result-negative', 'icon': '⚠️', 'title': 'Risiko Tinggi', 'level': 'risiko tinggi'},
+}
+
+RISK_BADGE_TEMPLATE = Template(
+    '<div class="risk-badge risk-high">'
+    '<div class="risk-title">$title</div><div class="risk-value">$value</div>'
+    '</div>'
+)
+RISK_GRID = '<div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 1rem;">{}</div>'
+
+# One card per recommendation template ID (markdown bold -> <strong>)
+RECOMMENDATION_CARDS = [
+    '<div class="recommendation-card">{}</div>'.format(
+        re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text))
+    for text in RECOMMENDATION_TEMPLATES
+]
+
+
+def section_heading(title):
+    """Spacer and h3 as one element (was two st.markdown calls)"""
+    return f"{SPACER.format(2)}<h3>{title}</h3>"
+
+
+@lru_cache(maxsize=1024)
+def _render(prediction, probability_text, risk_items, cholesterol, resting_bp):
+    summary = (SPACER.format(3) + '<hr>'
+               + BANNER_TEMPLATE.substitute(BANNERS[prediction], probability=probability_text)
+               + SPACER.format(2))
+
+    risk_factors = dict(risk_items)
+    badges = [
+        ('high_cholesterol', '🔴 Kolesterol Tinggi', f"{cholesterol} mg/dl"),
+        ('high_bp', '🔴 Tekanan Darah Tinggi', f"{resting_bp} mm Hg"),
+        ('high_blood_sugar', '🔴 Gula Darah Tinggi', "Puasa > 120 mg/dl"),
+    ]
+    cells = ''.join(RISK_BADGE_TEMPLATE.substitute(title=title, value=value)
+                    if risk_factors.get(key, False) else '<div></div>'
+                    for key, title, value in badges)
+    mask = recommendation_mask(prediction, risk_factors)
+    cards = ''.join(card for i, card in enumerate(RECOMMENDATION_CARDS) if mask >> i & 1)
+    advice = (section_heading("⚠️ Faktor Risiko Terdeteksi") + RISK_GRID.format(cells)
+              + section_heading("💡 Rekomendasi untuk Anda") + cards + SPACER.format(2))
+    return summary, advice
+
+
+def render_results(prediction, probability, risk_factors, input_data):
+    """
+    (summary_html, advice_html) for one prediction: the banner goes above the
+    charts, risk-factor badges and recommendation cards below the what-if
+    section. Cached per (prediction, displayed probability, risk factors, values).
+    """
+    risk_items = tuple(sorted((key, bool(value)) for key, value in risk_factors.items()))
+    return _render(int(prediction), f"{probability*100:.1f}", risk_items,
+                   input_data['Cholesterol'], input_data['RestingBP'])
@@ -0,0 +1,79 @@
+# scoring.py - Single entry point for turning inputs into risk probabilities
+#
+# Every scoring path (wizard, sweeps, batch jobs) goes through here so that
+# optional stages (probability calibration, ...) apply everywhere.
+
+import time
+
+import numpy as np
+
+from utils import encode_row, CompactBatch
+
+
+def apply_calibration(proba, calibration):
+    """
+    Map raw forest probabilities through the isotonic lookup table
+    calibration: {'x': [...], 'y': [...]} from calibration.py, or None (identity)
+    """
+    if calibration is None:
+        return proba
+    return np.interp(proba, calibration['x'], calibration['y'])
+
+
+def predict_proba(models_dict, X):
+    """
+    Class-1 risk probability for encoded rows (batch), calibrated if available
+    X: dense matrix or utils.CompactBatch (scored chunk by chunk)
+    """
+    model = models_dict['scoring_model']
+    if isinstance(X, CompactBatch):
+        proba = np.empty(len(X))
+        for start, dense in X.iter_dense():
+            proba[start:start + len(dense)] = model.predict_proba(dense)[:, 1]
+    else:
+        proba = model.predict_proba(X)[:, 1]
+    return apply_calibration(proba, models_dict.get('calibration'))
+
+
+def compute_score(models_dict, input_data):
+    """
+    Score one patient (raw input dict) without side effects
+    Returns {'prediction', 'probability', 'raw_probability', 'features' (encoded row),
+             'latency_ms'}
+    """
+    start = time.perf_counter()
+    X = encode_row(input_data, models_dict['scaler'], models_dict['label_tables'],
+                   models_dict['feature_names'])
+    raw = models_dict['scoring_model'].predict_proba(X)[0, 1]
+    probability = float(apply_calibration(raw, models_dict.get('calibration')))
+    return {
+        'prediction': int(probability > 0.5),  # ties go to class 0, like predict()
+        'probability': probability,
+        'raw_probability': float(raw),
+        'features': X,
+        'latency_ms': (time.perf_counter() - start) * 1000,
+    }
+
+
+def report_score(models_dict, input_data, scored, shadow=None, audit=None, drift=None):
+    """
+    Hand a prediction the user actually received to the monitors
+    shadow: optional shadow.ShadowScorer, gets the same encoded row
+    audit: optional audit.AuditLog, gets the row, probability and latency
+    drift: optional drift.DriftMonitor, updated with the raw inputs
+    """
+    if shadow is not None:
+        shadow.submit(scored['features'], scored['raw_probability'])
+    if audit is not None:
+        version = models_dict.get('model_version', models_dict['model_variant'])
+        audit.record(input_data, scored['features'], scored['probability'], version,
+                     scored['latency_ms'])
+    if drift is not None:
+        drift.update(input_data)
+
+
+def score_patient(models_dict, input_data, shadow=None, audit=None, drift=None):
+    """Score one patient and report it to the given monitors (see compute_score/report_score)"""
+    scored = compute_score(models_dict, input_data)
+    report_score(models_dict, input_data, scored, shadow, audit, drift)
+    return scored
@@ -0,0 +1,172 @@
+# shadow.py - Champion/challenger shadow scoring
+#
+# The champion answers the user; the challenger (XGBoost) scores the same
+# encoded row on a background thread and only feeds in-memory agreement
+# statistics. Submitting never blocks: when the backlog is full the row is
+# dropped (and counted) instead of slowing the user path down. One scorer
+# lives for the whole process; on a model reload set_challenger() swaps in
+# the new challenger and restarts the statistics, which carry the model
+# version and start time they cover.
+#
+# Enabled with SHADOW_SCORING=1.
+
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from booster import BoosterScorer, is_xgboost_model
+
+DELTA_BINS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+
+
+def shadow_enabled():
+    return os.environ.get('SHADOW_SCORING', '0').lower() in ('1', 'true', 'yes')
+
+
+class ShadowScorer:
+    """
+    Background challenger scoring with running agreement statistics
+    challenger: fitted classifier with predict_proba (encoded rows, like the champion),
+                or None until set_challenger()
+    version: model version the challenger belongs to (reported in stats())
+    n_jobs: threads per challenger call; a private copy of the model is made so
+            the shared one keeps its settings and the shadow can't starve the champion
+            (XGBoost models are scored through booster.BoosterScorer)
+    """
+
+    def __init__(self, challenger=None, name='xgboost', version=None, max_workers=1, max_pending=64,
+                 threshold=0.5, n_jobs=1):
+        self.name = name
+        self.threshold = threshold
+        self.max_pending = max_pending
+        self.n_jobs = n_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._generation = 0
+        self.challenger = None
+        self.version = None
+        if challenger is None:
+            self.reset()
+        else:
+            self.set_challenger(challenger, version)
+
+    def _private_copy(self, challenger):
+        if is_xgboost_model(challenger):
+            return BoosterScorer(challenger, n_threads=self.n_jobs)
+        private = copy.deepcopy(challenger)
+        if self.n_jobs is not None and 'n_jobs' in private.get_params():
+            private.set_params(n_jobs=self.n_jobs)
+        return private
+
+    def set_challenger(self, challenger, version=None):
+        """
+        Score against another challenger (model reload); statistics restart and
+        rows still queued for the old one are not counted. No-op if `version`
+        is already active.
+        """
+        if version is not None and version == self.version:
+            return
+        private = self._private_copy(challenger)
+        with self._lock:
+            if version is not None and version == self.version:
+                return
+            self.challenger = private
+            self.version = version
+            self._generation += 1
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.since = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._n = 0
+            self._agree = 0
+            self._sum_delta = 0.0
+            self._sum_abs_delta = 0.0
+            self._max_abs_delta = 0.0
+            self._delta_counts = np.zeros(len(DELTA_BINS) + 1, dtype=np.int64)
+            self._sum_latency = 0.0
+            self._dropped = 0
+            self._errors = 0
+
+    def submit(self, X, champion_proba):
+        """
+        Queue challenger scoring of encoded rows X against the champion's
+        class-1 probabilities (scalar or array). Returns immediately.
+        """
+        with self._lock:
+            if self.challenger is None:
+                return False
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._pending += 1
+            challenger, generation = self.challenger, self._generation
+        self._executor.submit(self._score, challenger, generation, np.array(X, copy=True),
+                              np.atleast_1d(np.asarray(champion_proba, dtype=float)))
+        return True
+
+    def _score(self, challenger, generation, X, champion_proba):
+        try:
+            start = time.perf_counter()
+            challenger_proba = challenger.predict_proba(X)[:, 1]
+            latency = time.perf_counter() - start
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                if generation == self._generation:
+                    self._errors += 1
+            return
+
+        delta = challenger_proba - champion_proba
+        abs_delta = np.abs(delta)
+        agree = (challenger_proba > self.threshold) == (champion_proba > self.threshold)
+        with self._lock:
+            self._pending -= 1
+            if generation != self._generation:
+                return  # scored by a challenger that has been replaced since
+            self._n += len(delta)
+            self._agree += int(agree.sum())
+            self._sum_delta += float(delta.sum())
+            self._sum_abs_delta += float(abs_delta.sum())
+            self._max_abs_delta = max(self._max_abs_delta, float(abs_delta.max()))
+            self._delta_counts += np.bincount(np.searchsorted(DELTA_BINS, abs_delta),
+                                              minlength=len(DELTA_BINS) + 1)
+            self._sum_latency += latency
+
+    def stats(self):
+        """Snapshot of the running statistics (safe to call from any thread)"""
+        with self._lock:
+            n = self._n
+            labels = [f"<{b:g}" for b in DELTA_BINS] + [f">={DELTA_BINS[-1]:g}"]
+            return {
+                'challenger': self.name,
+                'model_version': self.version,
+                'since': self.since,
+                'scored': n,
+                'agreement_rate': self._agree / n if n else None,
+                'mean_delta': self._sum_delta / n if n else None,  # challenger - champion
+                'mean_abs_delta': self._sum_abs_delta / n if n else None,
+                'max_abs_delta': self._max_abs_delta,
+                'abs_delta_histogram': dict(zip(labels, self._delta_counts.tolist())),
+                'mean_latency_ms': self._sum_latency / n * 1000 if n else None,
+                'pending': self._pending,
+                'dropped': self._dropped,
+                'errors': self._errors,
+            }
+
+    def wait(self):
+        """Block until every queued row has been scored (benchmarks/shutdown)"""
+        while True:
+            with self._lock:
+                if self._pending == 0:
+                    return
+            time.sleep(0.001)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
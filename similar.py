@@ -0,0 +1,199 @@
+# similar.py - "Patients like you": Random Forest proximity search
+#
+# Two records are similar when they land in the same leaf in many trees
+# (forest proximity = shared leaves / n_trees). For a reference cohort the
+# leaf of every record in every tree is computed once and stored as an
+# inverted index (tree, leaf) -> record ids, in CSR form: one int32 slab of
+# n_records ids per tree, sorted by leaf, plus offsets per global node id.
+# A query walks the patient down each tree (CompiledForest.apply), gathers
+# the posting lists of its leaves and counts shared leaves per record with
+# one bincount; cost is the total posting length, not n_records x n_trees.
+#
+# The index is tied to the scoring model it was built with (node count
+# check, like the calibration table) and stored in models/similar_index.npz:
+#   python similar.py --data cohort.csv     # CSV/Parquet of raw inputs (+ HeartDisease)
+#   python similar.py --audit               # logged predictions (audit_logs/*.arrow)
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from scoring import predict_proba
+from utils import MODELS_DIR, BASE_DIR, load_models, compact_batch, forest_signature, CompactBatch
+from validation import InputSchema
+
+SIMILAR_INDEX_FILE = 'similar_index.npz'
+NO_OUTCOME = -1
+BUILD_TREE_GROUP = 10  # trees whose leaves are kept per pass (n_records x 10 int32)
+
+
+class SimilarityIndex:
+    """
+    Inverted (tree, leaf) -> record index over a reference cohort
+    probability: model risk per record; outcome: HeartDisease per record
+    (NO_OUTCOME when unknown, e.g. for logged predictions)
+    """
+
+    def __init__(self, postings, indptr, node_offsets, probability, outcome, info):
+        self.postings = postings
+        self.indptr = indptr
+        self.node_offsets = node_offsets
+        self.probability = probability
+        self.outcome = outcome
+        self.info = info
+        self.n_records = len(probability)
+        self.n_trees = len(node_offsets)
+
+    @classmethod
+    def build(cls, forest, X, probability, outcome=None, source=''):
+        """
+        Leaf of every row in every tree of a fitted forest -> index
+        X: dense matrix or utils.CompactBatch (decoded chunk by chunk, once
+           per group of BUILD_TREE_GROUP trees)
+        """
+        if isinstance(X, CompactBatch):
+            chunks = X.iter_dense  # never the whole dense matrix at once
+        else:
+            dense = np.ascontiguousarray(X, dtype=np.float32)
+            chunks = lambda: [(0, dense)]
+        n = len(X)
+        node_counts = [e.tree_.node_count for e in forest.estimators_]
+        node_offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int64)
+        postings = np.empty(len(node_counts) * n, dtype=np.int32)
+        indptr = np.empty(sum(node_counts) + 1, dtype=np.int64)
+        indptr[0] = 0
+        # Leaves of BUILD_TREE_GROUP trees per pass over the rows
+        for first in range(0, len(node_counts), BUILD_TREE_GROUP):
+            group = forest.estimators_[first:first + BUILD_TREE_GROUP]
+            leaves = np.empty((len(group), n), dtype=np.int32)
+            for start, rows in chunks():
+                for g, estimator in enumerate(group):
+                    leaves[g, start:start + len(rows)] = estimator.tree_.apply(rows)
+            for t, tree_leaves in enumerate(leaves, start=first):
+                postings[t * n:(t + 1) * n] = np.argsort(tree_leaves, kind='stable')
+                counts = np.bincount(tree_leaves, minlength=node_counts[t])
+                start = node_offsets[t]
+                indptr[start + 1:start + node_counts[t] + 1] = t * n + np.cumsum(counts)
+
+        outcome = (np.full(n, NO_OUTCOME, dtype=np.int8) if outcome is None
+                   else np.asarray(outcome, dtype=np.int8))
+        info = {'source': source, 'records': n, 'forest': forest_signature(forest),
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        return cls(postings, indptr, node_offsets, np.asarray(probability, dtype=np.float32),
+                   outcome, info)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """From the dict load_models reads out of similar_index.npz"""
+        return cls(arrays['postings'], arrays['indptr'], arrays['node_offsets'],
+                   arrays['probability'], arrays['outcome'], json.loads(str(arrays['info'])))
+
+    def save(self, path):
+        np.savez(path, postings=self.postings, indptr=self.indptr, node_offsets=self.node_offsets,
+                 probability=self.probability, outcome=self.outcome, info=json.dumps(self.info))
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.postings, self.indptr, self.node_offsets,
+                                      self.probability, self.outcome))
+
+    def shared_leaves(self, leaves):
+        """Number of trees in which each record shares the patient's leaf"""
+        nodes = self.node_offsets + np.asarray(leaves)
+        ids = np.concatenate([self.postings[self.indptr[g]:self.indptr[g + 1]] for g in nodes])
+        return np.bincount(ids, minlength=self.n_records)
+
+    def query(self, leaves, k=10):
+        """
+        Top-k records by proximity for a patient given its leaf in every tree
+        Returns (record ids, proximity in [0, 1]), most similar first
+        """
+        counts = self.shared_leaves(leaves)
+        k = min(k, self.n_records)
+        # Counts are small integers: the k-th largest comes from a histogram,
+        # cheaper than argpartition over all records
+        at_least = np.cumsum(np.bincount(counts, minlength=self.n_trees + 1)[::-1])
+        threshold = self.n_trees - np.searchsorted(at_least, k)
+        candidates = np.flatnonzero(counts >= threshold)
+        top = candidates[np.lexsort((candidates, -counts[candidates]))][:k]
+        return top, counts[top] / self.n_trees
+
+    def neighbours(self, compiled, row, k=10):
+        """
+        Summary of the k most similar records for one encoded row
+        compiled: forest.CompiledForest of the model the index was built with
+        """
+        ids, proximity = self.query(compiled.apply(row), k)
+        outcome = self.outcome[ids]
+        known = outcome != NO_OUTCOME
+        return {
+            'ids': ids,
+            'proximity': proximity,
+            'probability': self.probability[ids],
+            'outcome': outcome,
+            'mean_probability': float(self.probability[ids].mean()),
+            'outcome_rate': float(outcome[known].mean()) if known.any() else None,
+        }
+
+
+def cohort_from_data(path, models_dict):
+    """Encoded rows, model risk and HeartDisease (if present) of a CSV/Parquet of raw inputs"""
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    outcome = df.pop('HeartDisease').to_numpy() if 'HeartDisease' in df else None
+    result = InputSchema.from_models(models_dict).validate(df)
+    if result.n_invalid:
+        print(f"⚠️ Skipping {result.n_invalid} invalid row(s)")
+    X = compact_batch(result.data[result.valid], models_dict['scaler'],
+                      models_dict['label_tables'], models_dict['feature_names'])
+    if outcome is not None:
+        outcome = outcome[result.valid]
+    return X, outcome
+
+
+def cohort_from_audit(directory):
+    """Encoded rows of the logged predictions (encoded inputs; no outcome)"""
+    tables = [pa.ipc.open_stream(path).read_all() for path in sorted(glob.glob(
+        os.path.join(directory, '*.arrow')))]
+    if not tables:
+        raise SystemExit(f"❌ No audit files in {directory}")
+    features = pa.concat_tables(tables).column('features').combine_chunks()
+    return features.flatten().to_numpy().reshape(len(features), -1), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-patient index")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help="CSV/Parquet of raw inputs (optional HeartDisease column)")
+    source.add_argument('--audit', nargs='?', const=os.environ.get(
+        'AUDIT_LOG_DIR', os.path.join(BASE_DIR, 'audit_logs')), help="Audit log directory")
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    args = parser.parse_args()
+
+    models_dict = load_models()
+    if models_dict is None:
+        raise SystemExit(1)
+    forest = models_dict['scoring_model']
+
+    X, outcome = (cohort_from_data(args.data, models_dict) if args.data
+                  else cohort_from_audit(args.audit))
+    start = time.perf_counter()
+    probability = predict_proba(models_dict, X)
+    index = SimilarityIndex.build(forest, X, probability, outcome,
+                                  source=os.path.basename(args.data or args.audit.rstrip('/')))
+    index.info['model_variant'] = models_dict['model_variant']
+    print(f"\n🗂️ Indexed {index.n_records:,} records x {index.n_trees} trees in "
+          f"{time.perf_counter() - start:.1f}s ({index.nbytes/1e6:.1f} MB)")
+
+    path = os.path.join(args.output_dir, SIMILAR_INDEX_FILE)
+    index.save(path)
+    print(f"💾 Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# speculative.py - Speculative scoring while the user reviews step 4
+#
+# When step 3 is committed all 11 inputs are known, so the prediction (plus
+# the default risk curve and the what-if engine) is computed on a background
+# executor while the user reads the review page. The result is keyed on the
+# inputs' hash and the model version; "Analisis Sekarang" takes it if the
+# key still matches and discards it otherwise. The precomputation has no
+# side effects: shadow/audit/drift only see the prediction once the user
+# actually asks for it.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from executor import ScoringBusy
+from scoring import compute_score
+from utils import patient_hash
+from whatif import WhatIfEngine, sweep
+
+SESSION_KEY = 'speculation'
+DEFAULT_SWEEP_FIELD = 'Age'  # first option of the risk-curve selectbox
+
+
+def speculation_key(models_dict, input_data):
+    return (patient_hash(input_data), models_dict['model_version'])
+
+
+def precompute(models_dict, input_data):
+    """Everything the analyse click and the first results render need"""
+    scored = compute_score(models_dict, input_data)
+    sweep(input_data, DEFAULT_SWEEP_FIELD, None, models_dict)  # fills the risk-curve cache
+    engine = WhatIfEngine(
+        models_dict['compiled_forest'], models_dict['scaler'], models_dict['label_tables'],
+        models_dict['feature_names'], input_data, calibration=models_dict['calibration']
+    )
+    return {'scored': scored, 'engine': engine}
+
+
+class SpeculativeScorer:
+    """
+    Runs speculations on a shared executor (executor.ScoringExecutor, or a
+    private pool if None); each session keeps at most one speculation in its
+    own state (session: st.session_state or any dict)
+    """
+
+    def __init__(self, executor=None, max_workers=2):
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers,
+                                                        thread_name_prefix='speculative')
+        self._lock = threading.Lock()
+        self._metrics = {'submitted': 0, 'skipped': 0, 'hits': 0, 'misses': 0, 'discarded': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def submit(self, session, models_dict, input_data):
+        """
+        Start precomputing for these inputs, replacing the session's previous
+        speculation; skipped when the scoring executor is busy
+        """
+        self.discard(session)
+        input_data = dict(input_data)
+        try:
+            future = self._executor.submit(precompute, models_dict, input_data)
+        except ScoringBusy:
+            self._count('skipped')
+            return
+        session[SESSION_KEY] = (speculation_key(models_dict, input_data), future)
+        self._count('submitted')
+
+    def discard(self, session):
+        """Drop the session's speculation (cancelled if it hasn't started yet)"""
+        entry = session.pop(SESSION_KEY, None)
+        if entry is not None:
+            entry[1].cancel()
+            self._count('discarded')
+
+    def take(self, session, models_dict, input_data):
+        """
+        Precomputed result for exactly these inputs and model version, waiting
+        for it if it is still running; None (and the speculation discarded) otherwise
+        """
+        entry = session.get(SESSION_KEY)
+        if entry is None or entry[0] != speculation_key(models_dict, input_data):
+            self.discard(session)
+            self._count('misses')
+            return None
+        del session[SESSION_KEY]
+        try:
+            result = entry[1].result()
+        except Exception:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return result
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
@@ -9,10 +9,24 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from styles import get_custom_css, get_healthcare_icons
 from utils import (
-    load_models, preprocess_input, create_gauge_chart,
+    encode_row, create_gauge_chart, create_sweep_chart, create_heatmap_chart,
+    create_contribution_chart, create_permutation_importance_chart, INPUT_LABELS,
     create_feature_importance_chart, create_rf_prediction_chart,
-    get_health_recommendations, calculate_risk_factors
+    calculate_risk_factors
 )
+from validation import InputSchema
+from whatif import WhatIfEngine, sweep, sweep_2d
+from similar import SimilarityIndex
+from results import render_results, section_heading
+from explain import explain_prediction
+from scoring import compute_score, report_score
+from speculative import SpeculativeScorer
+from executor import ScoringExecutor, ScoringBusy
+from batch import file_format, new_output_path, screen_file
+from shadow import ShadowScorer, shadow_enabled
+from registry import ModelRegistry, admin_enabled
+from audit import AuditLog, audit_enabled
+from drift import DriftMonitor, drift_enabled, reference_from_scaler
 
 # ============================================================================
 # PAGE CONFIGURATION
@@ -31,13 +45,73 @@ icons = get_healthcare_icons()
 # LOAD MODELS
 # ============================================================================
 @st.cache_resource
-def get_models():
-    return load_models()
+def get_model_registry():
+    """Shared by all sessions; loads models/ in the background and reloads it when files change"""
+    return ModelRegistry().start()
 
-models_dict = get_models()
-if models_dict is None:
-    st.error("❌ **Error**: Tidak dapat memuat model")
-    st.stop()
+HEATMAP_AXES = [('Age', 'Cholesterol'), ('MaxHR', 'Oldpeak'), ('Age', 'RestingBP'), ('Age', 'MaxHR')]
+SIMILAR_PATIENTS = 10
+BATCH_PREVIEW_ROWS = 200  # rows of the latest chunk shown while screening
+
+LOADING_STAGES = {
+    'idle': "Menyiapkan model...",
+    'loading': "Memuat model...",
+    'warming': "Memanaskan model...",
+}
+
+def wait_for_models(registry):
+    """Progress indicator until the first load finishes (pages that need the model)"""
+    progress = st.progress(registry.progress, text=LOADING_STAGES.get(registry.stage, ""))
+    while not registry.wait(timeout=0.2):
+        progress.progress(registry.progress, text=LOADING_STAGES.get(registry.stage, ""))
+    progress.empty()
+
+model_registry = get_model_registry()
+
+@st.cache_resource
+def get_shadow_scorer():
+    """XGBoost challenger scoring in the background (SHADOW_SCORING=1), shared by all sessions"""
+    return ShadowScorer() if shadow_enabled() else None
+
+def current_shadow_scorer(models_dict):
+    """The shared shadow scorer, switched to this version's challenger (None if off or no XGBoost)"""
+    scorer = get_shadow_scorer()
+    if scorer is None or not models_dict['xgb_available']:
+        return None
+    scorer.set_challenger(models_dict['xgb_model'], models_dict['model_version'])
+    return scorer
+
+@st.cache_resource
+def get_audit_log():
+    """Audit trail of scores and encoded inputs (AUDIT_LOG=1), shared by all sessions"""
+    return AuditLog() if audit_enabled() else None
+
+@st.cache_resource
+def get_scoring_executor():
+    """Bounded pool for model calls shared by all sessions (SCORING_WORKERS, SCORING_MAX_QUEUE)"""
+    return ScoringExecutor()
+
+@st.cache_resource
+def get_speculative_scorer():
+    """Scores the wizard inputs on the scoring executor while step 4 is shown"""
+    return SpeculativeScorer(get_scoring_executor())
+
+scoring_executor = get_scoring_executor()
+speculative_scorer = get_speculative_scorer()
+
+@st.cache_resource
+def get_drift_monitor(model_version):
+    """Input drift vs the reference profile exported with the model (DRIFT_MONITOR=0 disables)"""
+    if not drift_enabled():
+        return None
+    return DriftMonitor(models_dict['drift_reference'] or reference_from_scaler(models_dict['scaler']))
+
+@st.cache_resource
+def get_similarity_index(model_version):
+    """Similar-patient index shipped with the model (None if similar.py was not run)"""
+    if models_dict['similar_index'] is None:
+        return None
+    return SimilarityIndex.from_arrays(models_dict['similar_index'])
 
 # ============================================================================
 # SESSION STATE INITIALIZATION
@@ -61,10 +135,26 @@ def navigate_to(page):
     st.session_state.step = 1
     st.rerun()
 
+def form_input_data(form_data):
+    """Raw model inputs from the wizard's form_data"""
+    return {
+        'Age': form_data['age'],
+        'Sex': form_data['sex'],
+        'ChestPainType': form_data['chest_pain'],
+        'RestingBP': form_data['resting_bp'],
+        'Cholesterol': form_data['cholesterol'],
+        'FastingBS': form_data['fasting_bs'],
+        'RestingECG': form_data['resting_ecg'],
+        'MaxHR': form_data['max_hr'],
+        'ExerciseAngina': form_data['exercise_angina'],
+        'Oldpeak': form_data['oldpeak'],
+        'ST_Slope': form_data['st_slope']
+    }
+
 # ============================================================================
 # MODERN HEADER WITH NAVIGATION
 # ============================================================================
-col1, col2, col3 = st.columns([2, 3, 2])
+col1, col2, col3 = st.columns([2, 2, 3])
 
 with col1:
     st.markdown(f"""
@@ -76,7 +166,7 @@ with col1:
     """, unsafe_allow_html=True)
 
 with col3:
-    nav_col1, nav_col2, nav_col3 = st.columns(3)
+    nav_col1, nav_col2, nav_col3, nav_col4 = st.columns(4)
     with nav_col1:
         if st.button("🏠 Home", use_container_width=True, 
                      type="primary" if st.session_state.page == 'home' else "secondary"):
@@ -86,12 +176,39 @@ with col3:
                      type="primary" if st.session_state.page == 'predict' else "secondary"):
             navigate_to('predict')
     with nav_col3:
+        if st.button("📂 Batch", use_container_width=True,
+                     type="primary" if st.session_state.page == 'batch' else "secondary"):
+            navigate_to('batch')
+    with nav_col4:
         if st.button("ℹ️ Info", use_container_width=True,
                      type="primary" if st.session_state.page == 'info' else "secondary"):
             navigate_to('info')
 
 st.markdown("<div style='margin-bottom: 2rem;'></div>", unsafe_allow_html=True)
 
+# ============================================================================
+# MODEL READINESS
+# ============================================================================
+# Home needs no model and renders while the first load runs; the other
+# pages wait here with a progress bar
+if not model_registry.ready.is_set() and st.session_state.page != 'home':
+    wait_for_models(model_registry)
+
+# One snapshot per script run: this run finishes on this version even if a
+# newer one is swapped in meanwhile
+models_dict = model_registry.current()
+if models_dict is None and model_registry.ready.is_set():
+    st.error("❌ **Error**: Tidak dapat memuat model")
+    st.stop()
+
+if models_dict is not None:
+    input_schema = InputSchema.from_models(models_dict)
+    compiled_forest = models_dict['compiled_forest']  # built and warmed by the registry
+    shadow_scorer = current_shadow_scorer(models_dict)
+    audit_log = get_audit_log()
+    drift_monitor = get_drift_monitor(models_dict['model_version'])
+    similarity_index = get_similarity_index(models_dict['model_version'])
+
 # ============================================================================
 # HOME PAGE
 # ============================================================================
@@ -201,11 +318,14 @@ if st.session_state.page == 'home':
         """, unsafe_allow_html=True)
     
     with col2:
+        privacy_note = ("Data klinis yang Anda masukkan dicatat dalam bentuk terenkode (tanpa nama "
+                        "atau kontak) beserta skornya untuk pemantauan model"
+                        if audit_enabled() else "Data Anda tidak disimpan dan tetap privat")
         st.markdown(f"""
             <div class="feature-card">
                 <div class="feature-icon">🔒</div>
                 <h3>Data Aman</h3>
-                <p>Data Anda tidak disimpan dan tetap privat</p>
+                <p>{privacy_note}</p>
             </div>
         """, unsafe_allow_html=True)
         
@@ -432,6 +552,10 @@ elif st.session_state.page == 'predict':
                     'oldpeak': oldpeak,
                     'st_slope': st_slope
                 })
+                # Score in the background while the user reviews step 4 (inputs
+                # are validated when the result is actually requested)
+                speculative_scorer.submit(st.session_state, models_dict,
+                                          form_input_data(st.session_state.form_data))
                 st.session_state.step = 4
                 st.rerun()
     
@@ -480,39 +604,30 @@ elif st.session_state.page == 'predict':
         col1, col2 = st.columns(2)
         with col1:
             if st.button("← Edit Data", use_container_width=True):
+                speculative_scorer.discard(st.session_state)
                 st.session_state.step = 1
                 st.rerun()
         with col2:
             if st.button("🔍 Analisis Sekarang", use_container_width=True, type="primary"):
                 with st.spinner("🤖 AI sedang menganalisis data Anda..."):
                     try:
-                        input_data = {
-                            'Age': st.session_state.form_data['age'],
-                            'Sex': st.session_state.form_data['sex'],
-                            'ChestPainType': st.session_state.form_data['chest_pain'],
-                            'RestingBP': st.session_state.form_data['resting_bp'],
-                            'Cholesterol': st.session_state.form_data['cholesterol'],
-                            'FastingBS': st.session_state.form_data['fasting_bs'],
-                            'RestingECG': st.session_state.form_data['resting_ecg'],
-                            'MaxHR': st.session_state.form_data['max_hr'],
-                            'ExerciseAngina': st.session_state.form_data['exercise_angina'],
-                            'Oldpeak': st.session_state.form_data['oldpeak'],
-                            'ST_Slope': st.session_state.form_data['st_slope']
-                        }
+                        input_data = form_input_data(st.session_state.form_data)
+                        input_schema.validate_row(input_data)  # fail fast before scoring
                         
-                        X_processed = preprocess_input(
-                            input_data, models_dict['scaler'],
-                            models_dict['label_encoders'], models_dict['feature_names']
-                        )
-                        
-                        model = models_dict['champion_model']
-                        prediction = model.predict(X_processed)[0]
-                        probability = model.predict_proba(X_processed)[0]
+                        # Precomputed since step 3 if the inputs are unchanged
+                        speculated = speculative_scorer.take(st.session_state, models_dict, input_data)
+                        if speculated is not None:
+                            scored = speculated['scored']
+                            st.session_state.whatif_engine = speculated['engine']
+                        else:
+                            scored = scoring_executor.run(compute_score, models_dict, input_data)
+                        report_score(models_dict, input_data, scored, shadow=shadow_scorer,
+                                     audit=audit_log, drift=drift_monitor)
                         
                         st.session_state.prediction_made = True
                         st.session_state.prediction_result = {
-                            'prediction': prediction,
-                            'probability': probability[1],
+                            'prediction': scored['prediction'],
+                            'probability': scored['probability'],
                             'input_data': input_data,
                             'risk_factors': calculate_risk_factors(input_data)
                         }
@@ -520,6 +635,9 @@ elif st.session_state.page == 'predict':
                         st.success("✅ Analisis selesai!")
                         st.balloons()
                         
+                    except ScoringBusy:
+                        st.warning("⏳ Server sedang sibuk melayani banyak pengguna. "
+                                   "Silakan coba lagi dalam beberapa detik.")
                     except Exception as e:
                         st.error(f"❌ Terjadi kesalahan: {str(e)}")
 
@@ -529,34 +647,12 @@ elif st.session_state.page == 'predict':
 if st.session_state.prediction_made and st.session_state.page == 'predict':
     result = st.session_state.prediction_result
     
-    st.markdown("<div style='margin: 3rem 0;'></div>", unsafe_allow_html=True)
-    st.markdown("---")
+    summary_html, advice_html = render_results(
+        result['prediction'], result['probability'], result['risk_factors'], result['input_data']
+    )
     
     # Main Result Card
-    if result['prediction'] == 0:
-        st.markdown(f"""
-            <div class="result-banner result-positive">
-                <div class="result-icon-large">💚</div>
-                <h1>Risiko Rendah</h1>
-                <p>Berdasarkan data yang dianalisis, Anda memiliki risiko rendah terkena penyakit jantung</p>
-                <div class="probability-badge">
-                    Tingkat Risiko: {result['probability']*100:.1f}%
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-            <div class="result-banner result-negative">
-                <div class="result-icon-large">⚠️</div>
-                <h1>Risiko Tinggi</h1>
-                <p>Berdasarkan data yang dianalisis, Anda memiliki risiko tinggi terkena penyakit jantung</p>
-                <div class="probability-badge">
-                    Tingkat Risiko: {result['probability']*100:.1f}%
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
+    st.markdown(summary_html, unsafe_allow_html=True)
     
     # Charts
     col1, col2 = st.columns(2)
@@ -571,46 +667,116 @@ if st.session_state.prediction_made and st.session_state.page == 'predict':
         pred_fig = create_rf_prediction_chart(result['probability'])
         st.plotly_chart(pred_fig, use_container_width=True)
     
-    # Risk Factors
-    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
-    st.markdown("### ⚠️ Faktor Risiko Terdeteksi")
-    
-    risk_factors = result['risk_factors']
-    risk_cols = st.columns(3)
-    
-    risk_items = [
-        ('high_cholesterol', '🔴 Kolesterol Tinggi', f"{result['input_data']['Cholesterol']} mg/dl"),
-        ('high_bp', '🔴 Tekanan Darah Tinggi', f"{result['input_data']['RestingBP']} mm Hg"),
-        ('high_blood_sugar', '🔴 Gula Darah Tinggi', "Puasa > 120 mg/dl")
+    # Risk Curve (partial dependence for one input)
+    st.markdown(section_heading("📈 Kurva Risiko"), unsafe_allow_html=True)
+    sweep_field = st.selectbox(
+        "Lihat perubahan risiko berdasarkan",
+        options=['Age', 'Cholesterol', 'RestingBP', 'MaxHR', 'Oldpeak'],
+        format_func=lambda x: INPUT_LABELS[x]
+    )
+    try:
+        sweep_grid, sweep_probabilities = scoring_executor.run(
+            sweep, result['input_data'], sweep_field, None, models_dict
+        )
+        sweep_fig = create_sweep_chart(
+            sweep_grid, sweep_probabilities, INPUT_LABELS[sweep_field],
+            result['input_data'][sweep_field], result['probability']
+        )
+        st.plotly_chart(sweep_fig, use_container_width=True)
+    except ScoringBusy:
+        st.info("⏳ Kurva risiko belum dapat dihitung karena server sedang sibuk. Muat ulang sebentar lagi.")
+    
+    # Risk Map (two inputs at once)
+    st.markdown(section_heading("🗺️ Peta Risiko"), unsafe_allow_html=True)
+    heatmap_axes = st.selectbox(
+        "Kombinasi faktor",
+        options=HEATMAP_AXES,
+        format_func=lambda axes: f"{INPUT_LABELS[axes[0]]} × {INPUT_LABELS[axes[1]]}"
+    )
+    try:
+        x_grid, y_grid, surface = scoring_executor.run(
+            sweep_2d, result['input_data'], *heatmap_axes, models_dict
+        )
+        x_field, y_field = heatmap_axes
+        heatmap_fig = create_heatmap_chart(
+            x_grid, y_grid, surface, INPUT_LABELS[x_field], INPUT_LABELS[y_field],
+            (result['input_data'][x_field], result['input_data'][y_field])
+        )
+        st.caption("Faktor lain tetap sesuai data Anda • garis putus-putus = batas risiko 50%")
+        st.plotly_chart(heatmap_fig, use_container_width=True)
+    except ScoringBusy:
+        st.info("⏳ Peta risiko belum dapat dihitung karena server sedang sibuk. Muat ulang sebentar lagi.")
+    
+    # Per-patient attribution
+    st.markdown(section_heading("🧩 Faktor yang Mempengaruhi Hasil Anda"), unsafe_allow_html=True)
+    patient_row = encode_row(result['input_data'], models_dict['scaler'],
+                             models_dict['label_tables'], models_dict['feature_names'])
+    explanation = explain_prediction(
+        compiled_forest, patient_row,
+        models_dict['feature_names'], models_dict['original_features'],
+        calibration=models_dict['calibration']
+    )
+    st.caption(f"Risiko rata-rata model: {explanation['bias']*100:.1f}% • "
+               f"merah menaikkan risiko, hijau menurunkan risiko")
+    st.plotly_chart(create_contribution_chart(explanation['contributions']), use_container_width=True)
+    
+    # Patients like you (forest proximity over the reference cohort)
+    if similarity_index is not None:
+        st.markdown(section_heading("👥 Pasien Serupa"), unsafe_allow_html=True)
+        similar = similarity_index.neighbours(compiled_forest, patient_row, k=SIMILAR_PATIENTS)
+        st.caption(f"{SIMILAR_PATIENTS} catatan paling mirip dari {similarity_index.n_records:,} "
+                   f"pasien referensi ({similarity_index.info['source']}) • kemiripan = porsi "
+                   f"pohon keputusan yang menempatkan Anda di daun yang sama")
+        col1, col2 = st.columns(2)
+        col1.metric("Rata-rata risiko pasien serupa", f"{similar['mean_probability']*100:.1f}%")
+        if similar['outcome_rate'] is not None:
+            col2.metric("Terdiagnosis penyakit jantung", f"{similar['outcome_rate']*100:.0f}%")
+        st.dataframe(pd.DataFrame({
+            'Kemiripan': [f"{p*100:.0f}%" for p in similar['proximity']],
+            'Risiko': [f"{p*100:.1f}%" for p in similar['probability']],
+            'Diagnosis': [{1: 'Penyakit jantung', 0: 'Sehat'}.get(int(o), '-') for o in similar['outcome']],
+        }), hide_index=True, use_container_width=True)
+    
+    # What-If Simulation
+    st.markdown(section_heading("🔮 Simulasi What-If"), unsafe_allow_html=True)
+    st.caption("Geser nilai di bawah untuk melihat perubahan tingkat risiko")
+    
+    engine = st.session_state.get('whatif_engine')
+    if (engine is None or engine.base_input != result['input_data']
+            or engine.compiled is not compiled_forest):
+        engine = WhatIfEngine(
+            compiled_forest, models_dict['scaler'],
+            models_dict['label_tables'], models_dict['feature_names'], result['input_data'],
+            calibration=models_dict['calibration']
+        )
+        st.session_state.whatif_engine = engine
+    
+    whatif_cols = st.columns(4)
+    whatif_sliders = [
+        ('Cholesterol', "Kolesterol (mg/dl)", 0, 600, 1),
+        ('RestingBP', "Tekanan Darah (mm Hg)", 80, 200, 1),
+        ('MaxHR', "Detak Jantung Maksimal", 60, 220, 1),
+        ('Oldpeak', "ST Depression (Oldpeak)", -3.0, 7.0, 0.1),
     ]
+    changes = {}
+    for col, (field, label, min_value, max_value, step) in zip(whatif_cols, whatif_sliders):
+        with col:
+            changes[field] = st.slider(
+                label, min_value=min_value, max_value=max_value,
+                value=result['input_data'][field], step=step
+            )
     
-    for idx, (key, title, value) in enumerate(risk_items):
-        with risk_cols[idx]:
-            if risk_factors.get(key, False):
-                st.markdown(f"""
-                    <div class="risk-badge risk-high">
-                        <div class="risk-title">{title}</div>
-                        <div class="risk-value">{value}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-    
-    # Recommendations
-    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
-    st.markdown("### 💡 Rekomendasi untuk Anda")
-    
-    recommendations = get_health_recommendations(
-        result['prediction'], result['probability'], risk_factors
+    whatif_probability = engine.predict(changes)
+    st.metric(
+        "Tingkat Risiko Simulasi", f"{whatif_probability*100:.1f}%",
+        delta=f"{(whatif_probability - result['probability'])*100:+.1f}%",
+        delta_color="inverse"
     )
     
-    for rec in recommendations:
-        st.markdown(f"""
-            <div class="recommendation-card">
-                {rec}
-            </div>
-        """, unsafe_allow_html=True)
+    # Risk Factors & Recommendations
+    st.markdown(advice_html, unsafe_allow_html=True)
     
     # Action Buttons
-    st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🔄 Lakukan Pemeriksaan Baru", use_container_width=True):
@@ -688,13 +854,75 @@ elif st.session_state.page == 'info':
     
     st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
     
-    # Feature Importance
+    # Feature Importance (precomputed at export time when available)
+    global_explanations = models_dict['global_explanations']
     st.markdown("### 📊 Fitur Paling Berpengaruh")
     rf_importance_fig = create_feature_importance_chart(
-        models_dict['rf_model'], models_dict['feature_names'], top_n=10
+        global_explanations['feature_importances'] if global_explanations else models_dict['rf_model'],
+        models_dict['feature_names'], top_n=10
     )
     st.plotly_chart(rf_importance_fig, use_container_width=True)
     
+    if global_explanations:
+        permutation = global_explanations.get('permutation_importance')
+        col1, col2 = st.columns(2) if permutation else (None, st.container())
+        
+        if permutation:  # only exported with real labels (explain.py --data)
+            with col1:
+                st.plotly_chart(create_permutation_importance_chart(permutation),
+                                use_container_width=True)
+        
+        with col2:
+            pd_curves = global_explanations['partial_dependence']
+            pd_field = st.selectbox(
+                "Partial dependence untuk",
+                options=list(pd_curves),
+                format_func=lambda x: INPUT_LABELS[x]
+            )
+            st.plotly_chart(
+                create_sweep_chart(pd_curves[pd_field]['grid'], pd_curves[pd_field]['mean'],
+                                   INPUT_LABELS[pd_field]),
+                use_container_width=True
+            )
+    
+    st.caption(f"🔁 Versi model aktif: {models_dict['model_version']} "
+               f"(dimuat {models_dict['loaded_at']})")
+    
+    if admin_enabled():
+        with st.expander("🔁 Versi Model (admin)"):
+            st.dataframe(pd.DataFrame(model_registry.versions()), use_container_width=True,
+                         hide_index=True)
+            if st.button("↩️ Kembalikan ke versi sebelumnya", disabled=not model_registry.history):
+                model_registry.rollback()
+                st.rerun()
+    
+    if shadow_scorer is not None:
+        with st.expander("🕶️ Shadow Scoring: Champion vs XGBoost"):
+            shadow_stats = shadow_scorer.stats()
+            st.caption(f"Versi model {shadow_stats['model_version']} • sejak {shadow_stats['since']}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Prediksi dibandingkan", shadow_stats['scored'])
+            if shadow_stats['scored']:
+                col2.metric("Kesepakatan", f"{shadow_stats['agreement_rate']*100:.1f}%")
+                col3.metric("Rata-rata |Δ probabilitas|", f"{shadow_stats['mean_abs_delta']*100:.1f}%")
+            st.json(shadow_stats)
+    
+    if audit_log is not None:
+        with st.expander("🗂️ Audit Log Prediksi"):
+            st.caption(f"Direktori: {audit_log.directory}")
+            st.json(audit_log.metrics())
+    
+    with st.expander("⚙️ Antrian Scoring"):
+        st.json({'executor': scoring_executor.metrics(), 'speculative': speculative_scorer.metrics()})
+    
+    if drift_monitor is not None:
+        with st.expander("📉 Drift Data Input"):
+            drift_report = drift_monitor.report()
+            st.caption(f"{drift_report['n']} prediksi sejak {drift_report['since']} • "
+                       f"referensi: {drift_report['reference']}")
+            st.dataframe(pd.DataFrame(drift_report['inputs']).T.rename(index=INPUT_LABELS),
+                         use_container_width=True)
+    
     st.markdown("<div style='margin: 2rem 0;'></div>", unsafe_allow_html=True)
     
     # About & Disclaimer
@@ -708,6 +936,62 @@ elif st.session_state.page == 'info':
         </div>
     """, unsafe_allow_html=True)
 
+# ============================================================================
+# BATCH SCREENING PAGE
+# ============================================================================
+if st.session_state.page == 'batch':
+    
+    st.markdown(f"""
+        <div class="section-title">
+            <h2>📂 Skrining Massal</h2>
+            <p>Unggah data banyak pasien sekaligus (CSV atau Parquet, maks. 200 MB)</p>
+        </div>
+    """, unsafe_allow_html=True)
+    
+    st.caption("Kolom wajib: " + ", ".join(INPUT_LABELS) +
+               ". Kolom lain (mis. ID pasien) ikut disalin ke hasil.")
+    uploaded = st.file_uploader("Pilih file", type=['csv', 'parquet'])
+    
+    if uploaded is not None and st.button("▶️ Mulai Skrining", type="primary"):
+        previous = st.session_state.pop('batch_result', None)
+        if previous and os.path.exists(previous['path']):
+            os.remove(previous['path'])
+        
+        progress = st.progress(0.0, text="Memulai skrining...")
+        stats_placeholder = st.empty()
+        table_placeholder = st.empty()
+        
+        def show_chunk(scored, stats):
+            progress.progress(stats['progress'], text=f"{stats['rows']:,} baris • "
+                                                      f"{stats['rows_per_s']:,.0f} baris/detik")
+            with stats_placeholder.container():
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Baris diproses", f"{stats['rows']:,}")
+                col2.metric("Risiko tinggi", f"{stats['high_risk']:,}")
+                col3.metric("Baris tidak valid", f"{stats['invalid']:,}")
+            table_placeholder.dataframe(scored.head(BATCH_PREVIEW_ROWS), use_container_width=True)
+        
+        output_path = new_output_path()
+        try:
+            stats = screen_file(models_dict, uploaded, file_format(uploaded.name), output_path,
+                                on_chunk=show_chunk, run=scoring_executor.run_when_admitted)
+            st.session_state.batch_result = {'path': output_path, 'name': uploaded.name, 'stats': stats}
+        except Exception as e:
+            os.remove(output_path)
+            st.error(f"❌ Terjadi kesalahan: {str(e)}")
+    
+    batch_result = st.session_state.get('batch_result')
+    if batch_result and os.path.exists(batch_result['path']):
+        stats = batch_result['stats']
+        st.success(f"✅ {batch_result['name']}: {stats['rows']:,} baris dalam {stats['elapsed_s']:.1f} detik "
+                   f"({stats['rows_per_s']:,.0f} baris/detik)")
+        with open(batch_result['path'], 'rb') as f:
+            st.download_button(
+                "⬇️ Unduh Hasil (CSV.GZ)", data=f,
+                file_name=os.path.splitext(batch_result['name'])[0] + '_hasil.csv.gz',
+                mime='application/gzip', use_container_width=True
+            )
+
 # Footer
 st.markdown("<div style='margin: 3rem 0;'></div>", unsafe_allow_html=True)
 st.markdown("---")
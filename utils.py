@@ -8,13 +8,14 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import os
 import pickle
+import hashlib
+import importlib.util
+import json
 
-# XGBoost import with fallback
-try:
-    import xgboost as xgb
-    XGBOOST_AVAILABLE = True
-except ImportError:
-    XGBOOST_AVAILABLE = False
+# XGBoost availability check with fallback (the package itself is imported
+# by unpickling, on the model-loading thread, so the first page paints sooner)
+XGBOOST_AVAILABLE = importlib.util.find_spec('xgboost') is not None
+if not XGBOOST_AVAILABLE:
     print("⚠️ XGBoost not available - will use Random Forest only")
 
 # Base directories
@@ -25,26 +26,59 @@ MODELS_DIR = os.path.join(BASE_DIR, "models")
 if not os.path.exists(MODELS_DIR):
     MODELS_DIR = os.path.join(os.path.dirname(BASE_DIR), "models")
 
+# Display labels of the 11 raw inputs
+INPUT_LABELS = {
+    'Age': "Usia (tahun)",
+    'RestingBP': "Tekanan Darah (mm Hg)",
+    'Cholesterol': "Kolesterol (mg/dl)",
+    'MaxHR': "Detak Jantung Maksimal",
+    'Oldpeak': "ST Depression (Oldpeak)",
+    'Sex': "Jenis Kelamin",
+    'ChestPainType': "Tipe Nyeri Dada",
+    'RestingECG': "EKG Istirahat",
+    'ExerciseAngina': "Nyeri Saat Olahraga",
+    'ST_Slope': "ST Slope",
+    'FastingBS': "Gula Darah Puasa",
+}
 
-def load_models():
+# Cholesterol 0 means "not measured"; preprocessing replaces it with this
+CHOLESTEROL_MEDIAN = 223.0  # Median from training
+
+# Columns holding small integer codes before scaling (see compact_batch)
+LABEL_ENCODED_COLUMNS = ['Sex', 'ExerciseAngina', 'ST_Slope', 'FastingBS']
+ONE_HOT_PREFIXES = ('ChestPainType_', 'RestingECG_', 'AgeGroup_', 'BP_Category_', 'Chol_Risk_',
+                    'HR_Category_')
+
+
+def forest_signature(forest):
+    """Cheap identity of a fitted forest: tree count and total node count"""
+    return f"{len(forest.estimators_)}:{sum(e.tree_.node_count for e in forest.estimators_)}"
+
+
+def load_models(model_variant=None, models_dir=None):
     """
     Load all saved models and preprocessing objects
     Champion Model: Random Forest (88.59% accuracy)
     XGBoost: Optional (for comparison if available)
+    Fast Model: Optional pruned/distilled forest (see pruning.py)
+    model_variant: 'champion' (default) or 'fast', also settable via MODEL_VARIANT env
+    models_dir: directory to read (default MODELS_DIR)
     """
+    model_variant = model_variant or os.environ.get('MODEL_VARIANT', 'champion')
+    models_dir = models_dir or MODELS_DIR
     try:
         print("\n" + "="*70)
         print("🔄 LOADING MODELS...")
         print("="*70)
         
         # Load Random Forest - CHAMPION MODEL (MUST HAVE)
-        rf_path = os.path.join(MODELS_DIR, 'random_forest_model.pkl')
+        rf_path = os.path.join(models_dir, 'random_forest_model.pkl')
         print(f"\n📂 Loading Random Forest (CHAMPION) from: {rf_path}")
         rf_model = joblib.load(rf_path)
         print("✅ Random Forest loaded successfully - CHAMPION MODEL (88.59% accuracy)")
         
         # Try to load champion_model.pkl (RF Baseline)
-        champion_path = os.path.join(MODELS_DIR, 'champion_model.pkl')
+        champion_path = os.path.join(models_dir, 'champion_model.pkl')
         if os.path.exists(champion_path):
             print(f"\n📂 Loading Champion Model from: {champion_path}")
             champion_model = joblib.load(champion_path)
@@ -59,7 +93,7 @@ def load_models():
         
         if XGBOOST_AVAILABLE:
             try:
-                xgb_path = os.path.join(MODELS_DIR, 'xgboost_model.pkl')
+                xgb_path = os.path.join(models_dir, 'xgboost_model.pkl')
                 print(f"\n📂 Attempting to load XGBoost from: {xgb_path}")
                 
                 # Try multiple loading methods
@@ -82,26 +116,103 @@ def load_models():
         else:
             print("\nℹ️ XGBoost library not available - using Random Forest only")
         
+        # Try to load pruned/distilled Fast Model (OPTIONAL - built by pruning.py)
+        fast_model = None
+        fast_metadata = None
+        fast_path = os.path.join(models_dir, 'fast_model.pkl')
+        if os.path.exists(fast_path):
+            print(f"\n📂 Loading Fast Model from: {fast_path}")
+            fast_model = joblib.load(fast_path)
+            fast_metadata_path = os.path.join(models_dir, 'fast_model_metadata.pkl')
+            if os.path.exists(fast_metadata_path):
+                fast_metadata = joblib.load(fast_metadata_path)
+            print(f"✅ Fast Model loaded ({len(fast_model.estimators_)} trees)")
+        
+        if model_variant == 'fast' and fast_model is not None:
+            scoring_model = fast_model
+        else:
+            if model_variant == 'fast':
+                print("⚠️ Fast Model requested but not found - run pruning.py first")
+            model_variant = 'champion'
+            scoring_model = champion_model
+        
         # Load preprocessing objects (REQUIRED)
         print("\n📂 Loading preprocessing objects...")
-        scaler = joblib.load(os.path.join(MODELS_DIR, 'scaler.pkl'))
+        scaler = joblib.load(os.path.join(models_dir, 'scaler.pkl'))
         print("✅ Scaler loaded")
         
-        label_encoders = joblib.load(os.path.join(MODELS_DIR, 'label_encoders.pkl'))
-        print("✅ Label encoders loaded")
+        label_encoders = joblib.load(os.path.join(models_dir, 'label_encoders.pkl'))
+        label_tables = compile_label_tables(label_encoders)
+        print("✅ Label encoders loaded (compiled to lookup tables)")
         
-        feature_names = joblib.load(os.path.join(MODELS_DIR, 'feature_names.pkl'))
+        feature_names = joblib.load(os.path.join(models_dir, 'feature_names.pkl'))
         print("✅ Feature names loaded")
         
-        metadata = joblib.load(os.path.join(MODELS_DIR, 'model_metadata.pkl'))
+        metadata = joblib.load(os.path.join(models_dir, 'model_metadata.pkl'))
         print("✅ Metadata loaded")
         
+        # Precomputed global explanations (OPTIONAL - built by explain.py)
+        global_explanations = None
+        explanations_path = os.path.join(models_dir, 'global_explanations.json')
+        if os.path.exists(explanations_path):
+            with open(explanations_path) as f:
+                global_explanations = json.load(f)
+            print("✅ Global explanations loaded")
+        
+        # Isotonic calibration table (OPTIONAL - built by calibration.py)
+        calibration = None
+        calibration_path = os.path.join(models_dir, 'calibration.json')
+        if os.path.exists(calibration_path):
+            with open(calibration_path) as f:
+                calibration = json.load(f)
+            if calibration.get('model_variant') != model_variant:
+                print(f"⚠️ Calibration was fitted for '{calibration.get('model_variant')}', ignoring")
+                calibration = None
+            elif calibration.get('forest') != forest_signature(scoring_model):
+                print("⚠️ Calibration was fitted for another forest (retrained?), ignoring - "
+                      "re-run calibration.py")
+                calibration = None
+            else:
+                print(f"✅ Calibration loaded ({len(calibration['x'])} knots)")
+        
+        # Drift reference profile (OPTIONAL - exported by drift.py)
+        drift_reference = None
+        drift_path = os.path.join(models_dir, 'drift_reference.json')
+        if os.path.exists(drift_path):
+            with open(drift_path) as f:
+                drift_reference = json.load(f)
+            print("✅ Drift reference profile loaded")
+        
+        # Similar-patient index (OPTIONAL - built by similar.py for this exact forest)
+        similar_index = None
+        similar_path = os.path.join(models_dir, 'similar_index.npz')
+        if os.path.exists(similar_path):
+            with np.load(similar_path) as f:
+                similar_index = dict(f)
+            built_for = json.loads(str(similar_index['info']))['forest']
+            if built_for != forest_signature(scoring_model):
+                print("⚠️ Similar-patient index was built for another model, ignoring")
+                similar_index = None
+            else:
+                print(f"✅ Similar-patient index loaded ({len(similar_index['probability']):,} records)")
+        
+        original_features_path = os.path.join(models_dir, 'original_features.pkl')
+        if os.path.exists(original_features_path):
+            original = joblib.load(original_features_path)
+            original_features = list(original['numerical']) + list(original['categorical'])
+            print("✅ Original features loaded")
+        else:
+            original_features = list(INPUT_LABELS)
+        
         print("\n" + "="*70)
         print("✅ MODELS LOADED SUCCESSFULLY!")
         print("="*70)
         print(f"\n🏆 Champion Model: Random Forest Baseline")
         print(f"   • Accuracy: 88.59%")
-        print(f"   • Status: ✅ Active")
+        print(f"   • Status: {'✅ Active' if model_variant == 'champion' else 'Standby'}")
+        if fast_model is not None:
+            print(f"\n⚡ Fast Model: {len(fast_model.estimators_)} trees"
+                  f" ({'✅ Active' if model_variant == 'fast' else 'Standby'})")
         if xgb_available:
             print(f"\n📊 XGBoost Model: Available for comparison")
         else:
@@ -113,22 +224,78 @@ def load_models():
             'champion_model': champion_model,  # RF Baseline
             'xgb_model': xgb_model,  # May be None
             'xgb_available': xgb_available,
+            'fast_model': fast_model,  # May be None
+            'fast_metadata': fast_metadata,  # Pruning report, may be None
+            'scoring_model': scoring_model,  # Champion or Fast Model (model_variant)
+            'model_variant': model_variant,
             'scaler': scaler,
             'label_encoders': label_encoders,
+            'label_tables': label_tables,  # Shared by all scoring paths
             'feature_names': feature_names,
-            'metadata': metadata
+            'original_features': original_features,  # The 11 raw inputs
+            'metadata': metadata,
+            'global_explanations': global_explanations,  # May be None
+            'calibration': calibration,  # Applied by scoring.py, may be None
+            'drift_reference': drift_reference,  # For drift.DriftMonitor, may be None
+            'similar_index': similar_index  # Arrays for similar.SimilarityIndex, may be None
         }
         
     except Exception as e:
         print(f"\n❌ Critical Error loading models: {str(e)}")
-        print(f"📁 Models directory: {MODELS_DIR}")
+        print(f"📁 Models directory: {models_dir}")
         print(f"📋 Files in models directory:")
-        if os.path.exists(MODELS_DIR):
-            for file in os.listdir(MODELS_DIR):
+        if os.path.exists(models_dir):
+            for file in os.listdir(models_dir):
                 print(f"   • {file}")
         return None
 
 
+def compile_label_tables(label_encoders):
+    """
+    Compile fitted LabelEncoders into plain lookup tables (done once at load time)
+    {col: {'classes': np.ndarray of str, 'codes': {class: code}}}
+    """
+    tables = {}
+    for col, le in label_encoders.items():
+        classes = [str(c) for c in le.classes_]
+        tables[col] = {
+            'classes': np.array(classes),
+            'codes': {c: code for code, c in enumerate(classes)},
+        }
+    return tables
+
+
+def as_label_tables(label_encoders):
+    """Accept either compiled label tables or the raw LabelEncoders"""
+    if all(isinstance(v, dict) for v in label_encoders.values()):
+        return label_encoders
+    return compile_label_tables(label_encoders)
+
+
+def encode_labels(col, values, label_tables):
+    """
+    Label-encode a scalar (returns int) or an array/Series (returns np.ndarray)
+    Values are compared as strings, like LabelEncoder.transform(x.astype(str))
+    """
+    table = label_tables[col]
+    if np.ndim(values) == 0:
+        code = table['codes'].get(str(values))
+        if code is None:
+            raise ValueError(f"Unknown {col} value {str(values)!r}; "
+                             f"expected one of {table['classes'].tolist()}")
+        return code
+
+    values = np.asarray(values).astype(str)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    for code, c in enumerate(table['classes']):
+        codes[values == c] = code
+    if (codes < 0).any():
+        unseen = sorted(set(values[codes < 0].tolist()))
+        raise ValueError(f"Unknown {col} value(s) {unseen} in {int((codes < 0).sum())} row(s); "
+                         f"expected one of {table['classes'].tolist()}")
+    return codes
+
+
 def preprocess_input(input_data, scaler, label_encoders, feature_names):
     """
     Preprocess user input to match training data format
@@ -138,7 +305,7 @@ def preprocess_input(input_data, scaler, label_encoders, feature_names):
     
     # Handle cholesterol zero values (same as training)
     if df['Cholesterol'].values[0] == 0:
-        df['Cholesterol'] = 223.0  # Median from training
+        df['Cholesterol'] = CHOLESTEROL_MEDIAN
     
     # Feature Engineering (same as training)
     # 1. Age Group
@@ -196,10 +363,10 @@ def preprocess_input(input_data, scaler, label_encoders, feature_names):
     df['Age_MaxHR_Ratio'] = df['Age'] / (df['MaxHR'] + 1)
     
     # Label Encoding for binary/ordinal features
+    label_tables = as_label_tables(label_encoders)
     for col in ['Sex', 'ExerciseAngina', 'ST_Slope', 'FastingBS']:
-        if col in df.columns and col in label_encoders:
-            le = label_encoders[col]
-            df[col] = le.transform(df[col].astype(str))
+        if col in df.columns and col in label_tables:
+            df[col] = encode_labels(col, df[col], label_tables)
     
     # One-hot encoding for nominal features
     df = pd.get_dummies(df, columns=['ChestPainType', 'RestingECG', 'AgeGroup', 
@@ -220,6 +387,341 @@ def preprocess_input(input_data, scaler, label_encoders, feature_names):
     return df_scaled
 
 
+def feature_values(input_data, label_tables, fields=None):
+    """
+    Unscaled encoded features of one patient as {feature name: value}
+    (one-hot groups: only the active dummy, with value 1)
+    fields: derive only the features fed by these raw inputs (None = all)
+    """
+    def needed(*inputs):
+        return fields is None or not fields.isdisjoint(inputs)
+
+    age = input_data['Age']
+    bp = input_data['RestingBP']
+    chol = input_data['Cholesterol']
+    max_hr = input_data['MaxHR']
+    oldpeak = input_data['Oldpeak']
+    if chol == 0:
+        chol = CHOLESTEROL_MEDIAN
+    values = {}
+
+    # Feature Engineering (same as training)
+    if needed('Age'):
+        values['Age'] = age
+        if age <= 40:
+            values['AgeGroup_Young'] = 1
+        elif age <= 50:
+            values['AgeGroup_Middle'] = 1
+        elif age <= 60:
+            values['AgeGroup_Senior'] = 1
+        else:
+            values['AgeGroup_Elderly'] = 1
+
+    if needed('RestingBP'):
+        values['RestingBP'] = bp
+        if bp < 120:
+            values['BP_Category_Normal'] = 1
+        elif bp < 130:
+            values['BP_Category_Elevated'] = 1
+        elif bp < 140:
+            values['BP_Category_High_Stage1'] = 1
+        else:
+            values['BP_Category_High_Stage2'] = 1
+
+    if needed('Cholesterol'):
+        values['Cholesterol'] = chol
+        if chol < 200:
+            values['Chol_Risk_Desirable'] = 1
+        elif chol < 240:
+            values['Chol_Risk_Borderline'] = 1
+        else:
+            values['Chol_Risk_High'] = 1
+
+    if needed('MaxHR'):
+        values['MaxHR'] = max_hr
+    if needed('Oldpeak'):
+        values['Oldpeak'] = oldpeak
+
+    if needed('Age', 'MaxHR'):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hr_percentage = np.float64(max_hr) / (220 - age) * 100
+        if hr_percentage < 60:
+            values['HR_Category_Low'] = 1
+        elif hr_percentage < 85:
+            values['HR_Category_Normal'] = 1
+        else:
+            values['HR_Category_High'] = 1
+        values['Age_MaxHR_Ratio'] = age / (max_hr + 1)
+
+    if needed('Age', 'Cholesterol'):
+        values['Age_Cholesterol_Interaction'] = age * chol
+
+    if needed('Age', 'Cholesterol', 'RestingBP', 'FastingBS', 'ExerciseAngina', 'Oldpeak'):
+        values['Risk_Score'] = (
+            int(age > 55) + int(chol > 240) + int(bp > 140) +
+            int(input_data['FastingBS'] == 1) +
+            int(input_data['ExerciseAngina'] == 'Y') +
+            int(oldpeak > 1.5)
+        )
+
+    # Label Encoding for binary/ordinal features
+    for col in ['Sex', 'ExerciseAngina', 'ST_Slope', 'FastingBS']:
+        if needed(col) and col in label_tables:
+            values[col] = encode_labels(col, input_data[col], label_tables)
+
+    # One-hot encoding for nominal features
+    for col in ['ChestPainType', 'RestingECG']:
+        if needed(col):
+            values[f'{col}_{input_data[col]}'] = 1
+
+    return values
+
+
+def encode_row(input_data, scaler, label_encoders, feature_names):
+    """
+    Fast path of preprocess_input for a single patient (no pandas objects)
+    Returns the same (1, n_features) scaled array as preprocess_input
+    """
+    index = {name: i for i, name in enumerate(feature_names)}
+    row = np.zeros(len(feature_names))
+    for name, value in feature_values(input_data, as_label_tables(label_encoders)).items():
+        if name in index:
+            row[index[name]] = value
+
+    # Scale the features (StandardScaler: (x - mean) / scale)
+    if scaler.with_mean:
+        row -= scaler.mean_
+    if scaler.with_std:
+        row /= scaler.scale_
+
+    return row.reshape(1, -1)
+
+
+def preprocess_batch(data, scaler, label_encoders, feature_names):
+    """
+    Preprocess many patients at once (same rules as preprocess_input, NumPy only)
+    data: DataFrame or dict of columns with the 11 raw inputs, one row per patient
+    """
+    index = {name: i for i, name in enumerate(feature_names)}
+    age = np.asarray(data['Age'], dtype=float)
+    bp = np.asarray(data['RestingBP'], dtype=float)
+    chol = np.asarray(data['Cholesterol'], dtype=float)
+    max_hr = np.asarray(data['MaxHR'], dtype=float)
+    oldpeak = np.asarray(data['Oldpeak'], dtype=float)
+    X = np.zeros((len(age), len(feature_names)))
+
+    # Handle cholesterol zero values (same as training)
+    chol = np.where(chol == 0, CHOLESTEROL_MEDIAN, chol)
+
+    # Feature Engineering (same as training)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hr_percentage = (max_hr / (220 - age)) * 100
+    categories = {
+        'ChestPainType': np.asarray(data['ChestPainType']),
+        'RestingECG': np.asarray(data['RestingECG']),
+        'AgeGroup': np.select([age <= 40, age <= 50, age <= 60],
+                              ['Young', 'Middle', 'Senior'], 'Elderly'),
+        'BP_Category': np.select([bp < 120, bp < 130, bp < 140],
+                                 ['Normal', 'Elevated', 'High_Stage1'], 'High_Stage2'),
+        'Chol_Risk': np.select([chol < 200, chol < 240], ['Desirable', 'Borderline'], 'High'),
+        'HR_Category': np.select([hr_percentage < 60, hr_percentage < 85], ['Low', 'Normal'], 'High'),
+    }
+    numeric = {
+        'Age': age,
+        'RestingBP': bp,
+        'Cholesterol': chol,
+        'MaxHR': max_hr,
+        'Oldpeak': oldpeak,
+        'Risk_Score': (
+            (age > 55).astype(int) +
+            (chol > 240).astype(int) +
+            (bp > 140).astype(int) +
+            (pd.to_numeric(np.asarray(data['FastingBS']), errors='coerce') == 1).astype(int) +
+            (np.asarray(data['ExerciseAngina']) == 'Y').astype(int) +
+            (oldpeak > 1.5).astype(int)
+        ),
+        'Age_Cholesterol_Interaction': age * chol,
+        'Age_MaxHR_Ratio': age / (max_hr + 1),
+    }
+    for col, values in numeric.items():
+        if col in index:
+            X[:, index[col]] = values
+
+    # Label Encoding for binary/ordinal features
+    label_tables = as_label_tables(label_encoders)
+    for col in LABEL_ENCODED_COLUMNS:
+        if col in index and col in label_tables:
+            X[:, index[col]] = encode_labels(col, data[col], label_tables)
+
+    # One-hot encoding for nominal features
+    for col, values in categories.items():
+        prefix = f'{col}_'
+        for name, i in index.items():
+            if name.startswith(prefix):
+                X[:, i] = values == name[len(prefix):]
+
+    # Scale the features (StandardScaler: (x - mean) / scale)
+    if scaler.with_mean:
+        X -= scaler.mean_
+    if scaler.with_std:
+        X /= scaler.scale_
+
+    return X
+
+
+COMPACT_CHUNK_ROWS = 65_536
+
+
+def is_categorical_feature(name):
+    return name in LABEL_ENCODED_COLUMNS or name.startswith(ONE_HOT_PREFIXES)
+
+
+class CompactBatch:
+    """
+    Encoded rows in narrow dtypes (see compact_batch): scaled numeric columns
+    as float32, categorical columns as int8 codes with a per-column table of
+    their scaled values. Dense float32 rows are rebuilt chunk by chunk.
+    """
+
+    def __init__(self, numeric, numeric_idx, codes, code_idx, code_values, n_features):
+        self.numeric = numeric
+        self.numeric_idx = numeric_idx
+        self.codes = codes
+        self.code_idx = code_idx
+        self.code_values = code_values
+        self.n_features = n_features
+
+    def __len__(self):
+        return len(self.numeric)
+
+    @property
+    def nbytes(self):
+        return self.numeric.nbytes + self.codes.nbytes + self.code_values.nbytes
+
+    def to_dense(self, start=0, stop=None, out=None):
+        """Rows start:stop as the float32 matrix the trees compare against"""
+        numeric = self.numeric[start:stop]
+        if out is None:
+            out = np.empty((len(numeric), self.n_features), dtype=np.float32)
+        out[:, self.numeric_idx] = numeric
+        codes = self.codes[start:stop]
+        for j, col in enumerate(self.code_idx):
+            out[:, col] = self.code_values[j][codes[:, j]]
+        return out
+
+    def iter_dense(self, chunk_rows=COMPACT_CHUNK_ROWS):
+        """(start, dense rows) over the whole batch, reusing one buffer"""
+        buffer = np.empty((min(chunk_rows, len(self)), self.n_features), dtype=np.float32)
+        for start in range(0, len(self), chunk_rows):
+            rows = min(chunk_rows, len(self) - start)
+            yield start, self.to_dense(start, start + rows, buffer[:rows])
+
+
+def compact_batch(data, scaler, label_encoders, feature_names, chunk_rows=COMPACT_CHUNK_ROWS):
+    """
+    preprocess_batch for large jobs: same values, encoded chunk by chunk into a
+    CompactBatch (about 60 B/row instead of 264 B/row for dense float64).
+    float32 loses nothing for the forests: sklearn and XGBoost compare float32
+    inputs against their thresholds anyway.
+    """
+    n = len(data['Age'])
+    numeric_idx = np.array([i for i, f in enumerate(feature_names) if not is_categorical_feature(f)])
+    code_idx = np.array([i for i, f in enumerate(feature_names) if is_categorical_feature(f)])
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(len(feature_names))
+    scale = scaler.scale_ if scaler.with_std else np.ones(len(feature_names))
+
+    columns = {col: np.asarray(data[col]) for col in INPUT_LABELS}  # once, not per chunk
+    numeric = np.empty((n, len(numeric_idx)), dtype=np.float32)
+    codes = np.empty((n, len(code_idx)), dtype=np.int8)
+    for start in range(0, n, chunk_rows):
+        chunk = {col: values[start:start + chunk_rows] for col, values in columns.items()}
+        X = preprocess_batch(chunk, scaler, label_encoders, feature_names)
+        numeric[start:start + len(X)] = X[:, numeric_idx]
+        codes[start:start + len(X)] = np.rint(X[:, code_idx] * scale[code_idx] + mean[code_idx])
+
+    # Scaled value of every code, computed like preprocess_batch does
+    levels = np.arange(max(len(t['classes']) for t in as_label_tables(label_encoders).values()))
+    code_values = ((levels[None, :] - mean[code_idx, None]) / scale[code_idx, None]).astype(np.float32)
+    return CompactBatch(numeric, numeric_idx, codes, code_idx, code_values, len(feature_names))
+
+
+def patient_hash(input_data):
+    """Stable short hash of a patient's raw inputs (cache key, audit id)"""
+    payload = json.dumps(
+        {k: v.item() if hasattr(v, 'item') else v for k, v in input_data.items()}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def category_frequencies(scaler):
+    """
+    Training frequencies of the categorical inputs, recovered from the scaler
+    (means of the one-hot / binary columns): {col: {category: p}}
+    """
+    stats = dict(zip(scaler.feature_names_in_, zip(scaler.mean_, scaler.scale_)))
+
+    def one_hot(prefix, values):
+        p = np.array([stats[f'{prefix}_{v}'][0] for v in values])
+        return dict(zip(values, p / p.sum()))
+
+    def binary(col, negative, positive):
+        p = float(stats[col][0])
+        return {negative: 1 - p, positive: p}
+
+    # ST_Slope is label-encoded (Down=0, Flat=1, Up=2): recover p(Flat), p(Up)
+    # from its mean and variance
+    slope_mean, slope_std = stats['ST_Slope']
+    second_moment = slope_std ** 2 + slope_mean ** 2
+    p_up = np.clip((second_moment - slope_mean) / 2, 0, 1)
+    p_flat = np.clip(slope_mean - 2 * p_up, 0, 1)
+    p_slope = np.array([max(1 - p_flat - p_up, 0), p_flat, p_up])
+
+    return {
+        'Sex': binary('Sex', 'F', 'M'),
+        'ChestPainType': one_hot('ChestPainType', ['ASY', 'NAP', 'ATA', 'TA']),
+        'FastingBS': binary('FastingBS', 0, 1),
+        'RestingECG': one_hot('RestingECG', ['Normal', 'ST', 'LVH']),
+        'ExerciseAngina': binary('ExerciseAngina', 'N', 'Y'),
+        'ST_Slope': dict(zip(['Down', 'Flat', 'Up'], p_slope / p_slope.sum())),
+    }
+
+
+def generate_synthetic_patients(n, scaler, seed=42):
+    """
+    Generate synthetic raw patients for validation/benchmarking
+    Numeric columns follow the training mean/std stored in the scaler,
+    categorical columns follow the training frequencies of the one-hot columns.
+    """
+    rng = np.random.default_rng(seed)
+    stats = dict(zip(scaler.feature_names_in_, zip(scaler.mean_, scaler.scale_)))
+    frequencies = category_frequencies(scaler)
+
+    def normal(col, low, high, decimals=0):
+        mean, std = stats[col]
+        return np.round(np.clip(rng.normal(mean, std, n), low, high), decimals)
+
+    def choice(col):
+        values, p = zip(*frequencies[col].items())
+        return rng.choice(list(values), size=n, p=p)
+
+    def binary(col, negative, positive):
+        return np.where(rng.random(n) < frequencies[col][positive], positive, negative)
+
+    return pd.DataFrame({
+        'Age': normal('Age', 28, 77).astype(int),
+        'Sex': binary('Sex', 'F', 'M'),
+        'ChestPainType': choice('ChestPainType'),
+        'RestingBP': normal('RestingBP', 80, 200).astype(int),
+        'Cholesterol': normal('Cholesterol', 85, 600).astype(int),
+        'FastingBS': binary('FastingBS', 0, 1).astype(int),
+        'RestingECG': choice('RestingECG'),
+        'MaxHR': normal('MaxHR', 60, 202).astype(int),
+        'ExerciseAngina': binary('ExerciseAngina', 'N', 'Y'),
+        'Oldpeak': normal('Oldpeak', -2.6, 6.2, decimals=1),
+        'ST_Slope': choice('ST_Slope'),
+    })
+
+
 def create_gauge_chart(probability, title):
     """Create a gauge chart for probability visualization"""
     fig = go.Figure(go.Indicator(
@@ -256,17 +758,131 @@ def create_gauge_chart(probability, title):
     return fig
 
 
+def create_sweep_chart(grid, probabilities, field_label, current_value=None, current_probability=None):
+    """
+    Risk curve: probability as a function of one input, others fixed
+    (patient sweep), or averaged over a cohort (partial dependence, no marker)
+    current_probability: the patient's own risk for the marker (default: nearest grid point)
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=grid, y=probabilities, mode='lines',
+        line=dict(color='#00D9A3', width=3),
+        name='Risiko',
+        hovertemplate=f'{field_label}: %{{x}}<br>Risiko: %{{y:.1%}}<extra></extra>'
+    ))
+    if current_value is not None:
+        if current_probability is None:
+            current_probability = probabilities[int(np.argmin(np.abs(np.asarray(grid, dtype=float)
+                                                                    - current_value)))]
+        fig.add_trace(go.Scatter(
+            x=[current_value], y=[current_probability], mode='markers',
+            marker=dict(color='#FF6B6B', size=12),
+            name='Nilai Anda',
+            hovertemplate=f'Nilai Anda: %{{x}}<br>Risiko: %{{y:.1%}}<extra></extra>'
+        ))
+    fig.add_hline(y=0.5, line_dash='dash', line_color='#E0E0E0')
+
+    fig.update_layout(
+        xaxis_title=field_label,
+        yaxis_title='Probabilitas',
+        height=300,
+        margin=dict(l=20, r=20, t=30, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'family': 'Poppins, sans-serif'},
+        yaxis=dict(tickformat='.0%', range=[0, 1]),
+        showlegend=False
+    )
+    return fig
+
+
+def create_heatmap_chart(x_grid, y_grid, probabilities, x_label, y_label, current=None):
+    """
+    Risk surface over two inputs, others fixed; current=(x, y) marks the patient
+    """
+    fig = go.Figure(go.Heatmap(
+        x=x_grid, y=y_grid, z=probabilities,
+        zmin=0, zmax=1,
+        colorscale=[[0, '#00D9A3'], [0.5, '#FFD93D'], [1, '#FF6B6B']],
+        colorbar=dict(title='Risiko', tickformat='.0%'),
+        hovertemplate=f'{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Risiko: %{{z:.1%}}<extra></extra>'
+    ))
+    fig.add_trace(go.Contour(
+        x=x_grid, y=y_grid, z=probabilities,
+        contours=dict(start=0.5, end=0.5, coloring='none'),
+        line=dict(color='#FFFFFF', width=2, dash='dash'),
+        showscale=False, hoverinfo='skip'
+    ))
+    if current is not None:
+        fig.add_trace(go.Scatter(
+            x=[current[0]], y=[current[1]], mode='markers',
+            marker=dict(color='#FFFFFF', size=12, line=dict(color='#1A1A2E', width=2)),
+            name='Nilai Anda',
+            hovertemplate=f'Nilai Anda<br>{x_label}: %{{x}}<br>{y_label}: %{{y}}<extra></extra>'
+        ))
+
+    fig.update_layout(
+        xaxis_title=x_label,
+        yaxis_title=y_label,
+        height=400,
+        margin=dict(l=20, r=20, t=30, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'family': 'Poppins, sans-serif'},
+        showlegend=False
+    )
+    return fig
+
+
+def create_contribution_chart(contributions, top_n=8):
+    """
+    Per-patient attribution chart: how much each input pushed the risk up (red)
+    or down (green), in percentage points
+    """
+    items = sorted(contributions.items(), key=lambda kv: abs(kv[1]))[-top_n:]
+    values = [v * 100 for _, v in items]
+
+    fig = go.Figure(go.Bar(
+        x=values,
+        y=[INPUT_LABELS.get(k, k) for k, _ in items],
+        orientation='h',
+        marker_color=['#FF6B6B' if v > 0 else '#00D9A3' for v in values],
+        text=[f'{v:+.1f}%' for v in values],
+        textposition='auto',
+    ))
+
+    fig.update_layout(
+        title='Kontribusi Faktor terhadap Risiko Anda',
+        xaxis_title='Perubahan Risiko (poin %)',
+        height=400,
+        margin=dict(l=20, r=20, t=60, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'family': 'Poppins, sans-serif'},
+        showlegend=False
+    )
+    return fig
+
+
 def create_feature_importance_chart(model, feature_names, top_n=10):
-    """Create feature importance bar chart"""
-    importance = model.feature_importances_
-    indices = np.argsort(importance)[-top_n:]
+    """
+    Create feature importance bar chart
+    model: fitted forest, or precomputed importances from global_explanations.json
+    ({'names': [...], 'values': [...]}, sorted descending)
+    """
+    if isinstance(model, dict):
+        names = model['names'][:top_n][::-1]
+        values = np.asarray(model['values'][:top_n][::-1])
+    else:
+        importance = model.feature_importances_
+        indices = np.argsort(importance)[-top_n:]
+        names = [feature_names[i] for i in indices]
+        values = importance[indices]
     
     fig = go.Figure(go.Bar(
-        x=importance[indices],
-        y=[feature_names[i] for i in indices],
+        x=values,
+        y=names,
         orientation='h',
         marker=dict(
-            color=importance[indices],
+            color=values,
             colorscale='Teal',
             showscale=True,
             colorbar=dict(title="Importance")
@@ -285,6 +901,32 @@ def create_feature_importance_chart(model, feature_names, top_n=10):
     return fig
 
 
+def create_permutation_importance_chart(permutation):
+    """Permutation importance of the raw inputs (from global_explanations.json)"""
+    order = np.argsort(permutation['mean'])
+    inputs = [permutation['inputs'][i] for i in order]
+    means = np.asarray(permutation['mean'])[order]
+    stds = np.asarray(permutation['std'])[order]
+
+    fig = go.Figure(go.Bar(
+        x=means,
+        y=[INPUT_LABELS.get(k, k) for k in inputs],
+        orientation='h',
+        error_x=dict(type='data', array=stds, color='#2C3E50'),
+        marker_color='#00D9A3'
+    ))
+
+    fig.update_layout(
+        title='Pengaruh Input (Permutation Importance)',
+        xaxis_title=f"Penurunan {permutation['metric']}",
+        height=400,
+        margin=dict(l=20, r=20, t=60, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'family': 'Poppins, sans-serif'}
+    )
+    return fig
+
+
 def create_comparison_chart(rf_prob, xgb_prob=None):
     """
     Create model comparison chart
@@ -339,37 +981,58 @@ def create_comparison_chart(rf_prob, xgb_prob=None):
     return fig
 
 
-def get_health_recommendations(prediction, probability, risk_factors):
-    """Generate personalized health recommendations"""
-    recommendations = []
-    
+# Recommendation templates, in display order. A patient's recommendations are
+# stored as a bitmask of template IDs (bit i = RECOMMENDATION_TEMPLATES[i]).
+RECOMMENDATION_TEMPLATES = [
+    "🚨 **Segera Konsultasi dengan Dokter**: Hasil prediksi menunjukkan risiko tinggi penyakit jantung.",
+    "📋 **Pemeriksaan Lanjutan**: Disarankan melakukan pemeriksaan jantung lengkap (EKG, Echocardiogram, dll).",
+    "🥗 **Kolesterol Tinggi**: Kurangi konsumsi lemak jenuh, perbanyak serat dan omega-3.",
+    "💊 **Tekanan Darah Tinggi**: Batasi garam, kelola stres, dan rutin monitor tekanan darah.",
+    "⚠️ **Nyeri Dada saat Aktivitas**: Hindari aktivitas berat berlebihan, konsultasi untuk program olahraga yang aman.",
+    "🍎 **Gula Darah Tinggi**: Kontrol asupan gula, perbanyak sayuran, dan pertimbangkan cek diabetes.",
+    "✅ **Pertahankan Gaya Hidup Sehat**: Hasil prediksi baik, terus jaga pola hidup sehat.",
+    "🏃 **Olahraga Teratur**: Minimal 150 menit aktivitas aerobik sedang per minggu.",
+    "😴 **Tidur Cukup**: 7-9 jam per malam untuk kesehatan jantung optimal.",
+    "🚭 **Hindari Rokok**: Merokok adalah faktor risiko utama penyakit jantung.",
+    "🧘 **Kelola Stres**: Praktikkan teknik relaksasi seperti meditasi atau yoga.",
+]
+
+REC_HIGH_RISK = 0b11               # consult doctor + further examination
+REC_LOW_RISK = 1 << 6              # keep healthy lifestyle
+REC_GENERAL = 0b1111 << 7          # exercise, sleep, no smoking, stress
+REC_RISK_FACTORS = {               # risk factor -> template bit
+    'high_cholesterol': 1 << 2,
+    'high_bp': 1 << 3,
+    'exercise_angina': 1 << 4,
+    'high_blood_sugar': 1 << 5,
+}
+
+RISK_FACTOR_NAMES = ['high_cholesterol', 'high_bp', 'exercise_angina',
+                     'high_blood_sugar', 'old_age', 'abnormal_ecg']
+
+
+def recommendation_mask(prediction, risk_factors):
+    """Bitmask of recommendation template IDs for one patient"""
+    mask = REC_GENERAL
     if prediction == 1:  # High risk
-        recommendations.append("🚨 **Segera Konsultasi dengan Dokter**: Hasil prediksi menunjukkan risiko tinggi penyakit jantung.")
-        recommendations.append("📋 **Pemeriksaan Lanjutan**: Disarankan melakukan pemeriksaan jantung lengkap (EKG, Echocardiogram, dll).")
-    
-    # Risk-specific recommendations
-    if risk_factors.get('high_cholesterol', False):
-        recommendations.append("🥗 **Kolesterol Tinggi**: Kurangi konsumsi lemak jenuh, perbanyak serat dan omega-3.")
-    
-    if risk_factors.get('high_bp', False):
-        recommendations.append("💊 **Tekanan Darah Tinggi**: Batasi garam, kelola stres, dan rutin monitor tekanan darah.")
-    
-    if risk_factors.get('exercise_angina', False):
-        recommendations.append("⚠️ **Nyeri Dada saat Aktivitas**: Hindari aktivitas berat berlebihan, konsultasi untuk program olahraga yang aman.")
-    
-    if risk_factors.get('high_blood_sugar', False):
-        recommendations.append("🍎 **Gula Darah Tinggi**: Kontrol asupan gula, perbanyak sayuran, dan pertimbangkan cek diabetes.")
-    
-    # General recommendations
+        mask |= REC_HIGH_RISK
     if prediction == 0:  # Low risk
-        recommendations.append("✅ **Pertahankan Gaya Hidup Sehat**: Hasil prediksi baik, terus jaga pola hidup sehat.")
-    
-    recommendations.append("🏃 **Olahraga Teratur**: Minimal 150 menit aktivitas aerobik sedang per minggu.")
-    recommendations.append("😴 **Tidur Cukup**: 7-9 jam per malam untuk kesehatan jantung optimal.")
-    recommendations.append("🚭 **Hindari Rokok**: Merokok adalah faktor risiko utama penyakit jantung.")
-    recommendations.append("🧘 **Kelola Stres**: Praktikkan teknik relaksasi seperti meditasi atau yoga.")
-    
-    return recommendations
+        mask |= REC_LOW_RISK
+    for key, bit in REC_RISK_FACTORS.items():
+        if risk_factors.get(key, False):
+            mask |= bit
+    return mask
+
+
+def recommendations_from_mask(mask):
+    """Materialize the recommendation texts of a bitmask (display order)"""
+    mask = int(mask)
+    return [text for i, text in enumerate(RECOMMENDATION_TEMPLATES) if mask >> i & 1]
+
+
+def get_health_recommendations(prediction, probability, risk_factors):
+    """Generate personalized health recommendations"""
+    return recommendations_from_mask(recommendation_mask(prediction, risk_factors))
 
 
 def calculate_risk_factors(input_data):
@@ -385,6 +1048,50 @@ def calculate_risk_factors(input_data):
     return risk_factors
 
 
+def calculate_risk_factors_batch(data):
+    """
+    Batch version of calculate_risk_factors
+    data: DataFrame (or dict of columns) with the raw inputs; numeric columns
+          are coerced, so values read from CSV as strings ('1') count too
+    Returns {risk factor: bool np.ndarray}
+    """
+    number = lambda col: pd.to_numeric(np.asarray(data[col]), errors='coerce')
+    return {
+        'high_cholesterol': number('Cholesterol') > 240,
+        'high_bp': number('RestingBP') > 140,
+        'exercise_angina': np.asarray(data['ExerciseAngina']) == 'Y',
+        'high_blood_sugar': number('FastingBS') == 1,
+        'old_age': number('Age') > 60,
+        'abnormal_ecg': np.asarray(data['RestingECG']) != 'Normal',
+    }
+
+
+def recommendation_masks(predictions, risk_factors):
+    """
+    Batch version of recommendation_mask
+    predictions: int array (0/1), risk_factors: output of calculate_risk_factors_batch
+    Returns uint16 array of template bitmasks (2 bytes per patient)
+    """
+    predictions = np.asarray(predictions)
+    masks = np.full(len(predictions), REC_GENERAL, dtype=np.uint16)
+    masks[predictions == 1] |= REC_HIGH_RISK
+    masks[predictions == 0] |= REC_LOW_RISK
+    for key, bit in REC_RISK_FACTORS.items():
+        if key in risk_factors:
+            masks[np.asarray(risk_factors[key], dtype=bool)] |= bit
+    return masks
+
+
+def materialize_recommendations(masks, sep="\n"):
+    """
+    Recommendation text per patient, built once per distinct bitmask
+    (there are at most a few dozen combinations)
+    """
+    unique, inverse = np.unique(np.asarray(masks), return_inverse=True)
+    texts = [sep.join(recommendations_from_mask(mask)) for mask in unique]
+    return [texts[i] for i in inverse]
+
+
 def create_rf_prediction_chart(rf_prob):
     """
     Create simple Random Forest prediction chart
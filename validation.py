@@ -0,0 +1,186 @@
+# validation.py - Vectorized input validation before scoring
+#
+# The Streamlit wizard enforces ranges with widget bounds only; this schema
+# applies the same rules to whole columns so API/batch callers fail fast
+# (and can route bad rows aside) before reaching preprocessing.
+
+import numpy as np
+import pandas as pd
+
+# Same bounds as the number_input widgets in streamlit_app.py (steps 1-3)
+NUMERIC_RANGES = {
+    'Age': (1, 120),
+    'RestingBP': (80, 200),
+    'Cholesterol': (0, 600),
+    'MaxHR': (60, 220),
+    'Oldpeak': (-3.0, 7.0),
+}
+
+CATEGORIES = {
+    'Sex': ['M', 'F'],
+    'ChestPainType': ['ASY', 'NAP', 'ATA', 'TA'],
+    'RestingECG': ['Normal', 'ST', 'LVH'],
+    'ExerciseAngina': ['N', 'Y'],
+    'ST_Slope': ['Up', 'Flat', 'Down'],
+}
+
+BINARY_COLUMNS = ['FastingBS']
+
+INPUT_COLUMNS = ['Age', 'Sex', 'ChestPainType', 'RestingBP', 'Cholesterol', 'FastingBS',
+                 'RestingECG', 'MaxHR', 'ExerciseAngina', 'Oldpeak', 'ST_Slope']
+
+
+class ValidationResult:
+    """
+    Outcome of InputSchema.validate
+    data: coerced DataFrame (invalid cells become NaN/None)
+    column_errors: {column: bool array, True where the row is invalid}
+    valid: bool array, True where the whole row can be scored
+    """
+
+    def __init__(self, data, column_errors, schema):
+        self.data = data
+        self.column_errors = column_errors
+        self.valid = ~np.logical_or.reduce(list(column_errors.values()))
+        self.schema = schema
+
+    @property
+    def n_invalid(self):
+        return int((~self.valid).sum())
+
+    def error_messages(self, row):
+        """Human-readable errors for one row (only built on demand)"""
+        return [self.schema.describe(col) for col, mask in self.column_errors.items() if mask[row]]
+
+    def raise_for_errors(self):
+        """Raise ValueError describing the first invalid row, if any"""
+        if self.n_invalid:
+            row = int(np.argmin(self.valid))
+            raise ValueError(f"Invalid input (row {row}): " + "; ".join(self.error_messages(row)))
+
+
+class InputSchema:
+    """
+    Column-wise schema for the 11 raw inputs: numeric ranges, binary flags
+    and allowed categories, checked with NumPy over whole columns
+    """
+
+    def __init__(self, numeric_ranges=None, categories=None, binary_columns=None):
+        self.numeric_ranges = dict(numeric_ranges or NUMERIC_RANGES)
+        self.categories = {col: list(v) for col, v in (categories or CATEGORIES).items()}
+        self.binary_columns = list(binary_columns or BINARY_COLUMNS)
+
+    @classmethod
+    def from_models(cls, models_dict):
+        """Allowed categories taken from the label tables and one-hot feature names"""
+        categories = dict(CATEGORIES)
+        for col, table in models_dict['label_tables'].items():
+            if col in categories:
+                categories[col] = table['classes'].tolist()
+        for col in ['ChestPainType', 'RestingECG']:
+            prefix = f'{col}_'
+            values = [f[len(prefix):] for f in models_dict['feature_names'] if f.startswith(prefix)]
+            if values:
+                categories[col] = values
+        return cls(categories=categories)
+
+    def describe(self, col):
+        """Rule description for error messages"""
+        if col in self.numeric_ranges:
+            low, high = self.numeric_ranges[col]
+            return f"{col} must be a number between {low} and {high}"
+        if col in self.binary_columns:
+            return f"{col} must be 0 or 1"
+        return f"{col} must be one of {self.categories[col]}"
+
+    def validate(self, data):
+        """
+        Validate a DataFrame (batch) or dict (single patient)
+        Returns ValidationResult with coerced data and per-row error masks
+        """
+        if isinstance(data, dict):
+            data = pd.DataFrame([data])
+        n = len(data)
+        coerced = {}
+        column_errors = {}
+
+        for col, (low, high) in self.numeric_ranges.items():
+            if col not in data:
+                column_errors[col] = np.ones(n, dtype=bool)
+                coerced[col] = np.full(n, np.nan)
+                continue
+            values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=float)
+            bad = ~np.isfinite(values) | (values < low) | (values > high)
+            column_errors[col] = bad
+            coerced[col] = np.where(bad, np.nan, values)
+
+        for col in self.binary_columns:
+            if col not in data:
+                column_errors[col] = np.ones(n, dtype=bool)
+                coerced[col] = np.zeros(n, dtype=np.int64)
+                continue
+            values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=float)
+            bad = (values != 0) & (values != 1)
+            column_errors[col] = bad
+            coerced[col] = np.where(bad, 0, values).astype(np.int64)
+
+        for col, allowed in self.categories.items():
+            if col not in data:
+                column_errors[col] = np.ones(n, dtype=bool)
+                coerced[col] = np.full(n, None, dtype=object)
+                continue
+            values = np.asarray(data[col]).astype(str)
+            bad = ~np.isin(values, allowed)
+            if bad.any():
+                # Only the rejected cells pay for whitespace stripping
+                values[bad] = np.char.strip(values[bad])
+                bad = ~np.isin(values, allowed)
+            column_errors[col] = bad
+            coerced[col] = np.where(bad, None, values)
+
+        columns = [c for c in INPUT_COLUMNS if c in coerced] + [c for c in coerced if c not in INPUT_COLUMNS]
+        frame = pd.DataFrame({col: coerced[col] for col in columns}, index=data.index)
+        return ValidationResult(frame, column_errors, self)
+
+    def validate_row(self, input_data):
+        """
+        Validate one patient dict with the same rules (plain Python, no pandas)
+        Returns the coerced dict; raises ValueError listing every invalid field
+        """
+        row = dict(input_data)
+        errors = []
+
+        for col, (low, high) in self.numeric_ranges.items():
+            value = row.get(col)
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    value = None
+            if isinstance(value, bool) or not isinstance(value, (int, float, np.number)) \
+                    or not low <= value <= high:
+                errors.append(self.describe(col))
+                continue
+            row[col] = value
+
+        for col in self.binary_columns:
+            value = row.get(col)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = None
+            if value not in (0, 1):
+                errors.append(self.describe(col))
+                continue
+            row[col] = int(value)
+
+        for col, allowed in self.categories.items():
+            value = str(row.get(col)).strip()
+            if value not in allowed:
+                errors.append(self.describe(col))
+                continue
+            row[col] = value
+
+        if errors:
+            raise ValueError("Invalid input: " + "; ".join(errors))
+        return row
@@ -0,0 +1,177 @@
+# whatif.py - Incremental what-if analysis for one patient's result
+#
+# The patient's encoded row and per-tree leaves are cached once. A what-if
+# query ("cholesterol 190?") only derives and scales the columns fed by the
+# changed raw fields (utils.feature_values) and re-traverses only the trees
+# that split on a column whose value actually changed; every other tree keeps
+# its cached leaf.
+#
+# sweep() computes whole risk curves (one input over a grid) and sweep_2d()
+# risk surfaces (two inputs over a HEATMAP_SIZE x HEATMAP_SIZE grid), each in
+# a single batched predict_proba call.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import apply_calibration, predict_proba
+from utils import as_label_tables, encode_row, feature_values, preprocess_batch, patient_hash
+
+# Raw input -> encoded columns it feeds (entries ending in '_' are one-hot prefixes)
+FIELD_FEATURES = {
+    'Age': ['Age', 'Risk_Score', 'Age_Cholesterol_Interaction', 'Age_MaxHR_Ratio',
+            'AgeGroup_', 'HR_Category_'],
+    'Sex': ['Sex'],
+    'ChestPainType': ['ChestPainType_'],
+    'RestingBP': ['RestingBP', 'BP_Category_', 'Risk_Score'],
+    'Cholesterol': ['Cholesterol', 'Chol_Risk_', 'Risk_Score', 'Age_Cholesterol_Interaction'],
+    'FastingBS': ['FastingBS', 'Risk_Score'],
+    'RestingECG': ['RestingECG_'],
+    'MaxHR': ['MaxHR', 'Age_MaxHR_Ratio', 'HR_Category_'],
+    'ExerciseAngina': ['ExerciseAngina', 'Risk_Score'],
+    'Oldpeak': ['Oldpeak', 'Risk_Score'],
+    'ST_Slope': ['ST_Slope'],
+}
+
+# Default sweep grids, spanning the wizard's widget bounds
+SWEEP_GRIDS = {
+    'Age': np.arange(1, 121),
+    'MaxHR': np.arange(60, 221, 2),
+    'Oldpeak': np.round(np.arange(-3.0, 7.01, 0.2), 1),
+    'Cholesterol': np.arange(0, 601, 10),
+    'RestingBP': np.arange(80, 201, 2),
+}
+
+HEATMAP_SIZE = 50
+
+SWEEP_CACHE_SIZE = 256
+_sweep_cache = OrderedDict()
+_sweep_lock = threading.Lock()
+
+
+def field_feature_indices(feature_names):
+    """{raw field: np.ndarray of column indices it feeds}"""
+    indices = {}
+    for field, names in FIELD_FEATURES.items():
+        cols = [i for i, f in enumerate(feature_names)
+                if any(f.startswith(n) if n.endswith('_') else f == n for n in names)]
+        indices[field] = np.array(cols, dtype=int)
+    return indices
+
+
+class WhatIfEngine:
+    """
+    Cached state for one patient
+    compiled: forest.CompiledForest of the scoring model
+    calibration: lookup table applied to every probability returned (or None)
+    """
+
+    def __init__(self, compiled, scaler, label_tables, feature_names, input_data, calibration=None):
+        self.compiled = compiled
+        self.calibration = calibration
+        self.field_indices = field_feature_indices(feature_names)
+        self.label_tables = as_label_tables(label_tables)
+        self.feature_names = list(feature_names)
+        self.mean = scaler.mean_ if scaler.with_mean else np.zeros(len(feature_names))
+        self.scale = scaler.scale_ if scaler.with_std else np.ones(len(feature_names))
+
+        self.base_input = dict(input_data)
+        self.base_row = encode_row(self.base_input, scaler, self.label_tables, feature_names)[0]
+        self.base_leaves = compiled.apply(self.base_row)
+        self.base_tree_proba = compiled.leaf_proba(self.base_leaves)
+        self.probability = float(apply_calibration(self.base_tree_proba.mean(), calibration))
+        self.last_trees_evaluated = compiled.n_trees
+
+    def predict(self, changes):
+        """
+        Risk probability with some raw fields changed, e.g. {'Cholesterol': 190}
+        Always relative to the cached patient (changes are not accumulated)
+        """
+        changes = {k: v for k, v in changes.items() if v != self.base_input[k]}
+        if not changes:
+            self.last_trees_evaluated = 0
+            return self.probability
+
+        # Derive and scale only the columns fed by the changed fields
+        candidates = np.unique(np.concatenate([self.field_indices[f] for f in changes]))
+        values = feature_values({**self.base_input, **changes}, self.label_tables, set(changes))
+        raw = np.array([values.get(self.feature_names[i], 0) for i in candidates], dtype=float)
+        row = self.base_row.copy()
+        row[candidates] = (raw - self.mean[candidates]) / self.scale[candidates]
+
+        changed = candidates[row[candidates] != self.base_row[candidates]]
+        trees = self.compiled.trees_using(changed)
+        self.last_trees_evaluated = len(trees)
+
+        tree_proba = self.base_tree_proba.copy()
+        row32 = self.compiled.as_float32_row(row)
+        for t in trees:
+            tree_proba[t] = self.compiled.node_proba[t][self.compiled.leaf(t, row32)]
+        return float(apply_calibration(tree_proba.mean(), self.calibration))
+
+
+def heatmap_grid(field, n=HEATMAP_SIZE):
+    """n evenly spaced values over the field's sweep range (same resolution as the inputs)"""
+    grid = SWEEP_GRIDS[field]
+    values = np.linspace(grid[0], grid[-1], n)
+    return np.round(values, 1) if field == 'Oldpeak' else np.round(values).astype(int)
+
+
+def _cache_key(input_data, models_dict, *parts):
+    # The version covers the model and its calibration; object ids would be
+    # reused once the registry drops an old version. Dicts loaded outside the
+    # registry have no version (one model per process).
+    return (patient_hash(input_data), *parts, models_dict.get('model_version'))
+
+
+def _cached(key, compute):
+    with _sweep_lock:
+        if key in _sweep_cache:
+            _sweep_cache.move_to_end(key)
+            return _sweep_cache[key]
+    result = compute()
+    with _sweep_lock:
+        _sweep_cache[key] = result
+        if len(_sweep_cache) > SWEEP_CACHE_SIZE:
+            _sweep_cache.popitem(last=False)
+    return result
+
+
+def _score_variants(input_data, columns, models_dict):
+    """Probabilities for the patient with some inputs replaced by equal-length arrays"""
+    n = len(next(iter(columns.values())))
+    batch = {col: np.repeat(np.asarray([value]), n) for col, value in input_data.items()}
+    batch.update(columns)
+    X = preprocess_batch(batch, models_dict['scaler'], models_dict['label_tables'],
+                         models_dict['feature_names'])
+    return predict_proba(models_dict, X)
+
+
+def sweep(input_data, field, grid, models_dict):
+    """
+    Partial-dependence curve for one patient: probability for every value of
+    `field` in `grid`, others held fixed. All variants are encoded as one batch
+    matrix and scored with a single predict_proba call.
+    Cached per (patient hash, field, grid, model version).
+    """
+    grid = SWEEP_GRIDS[field] if grid is None else np.asarray(grid)
+    key = _cache_key(input_data, models_dict, field, grid.tobytes())
+    return _cached(key, lambda: (grid, _score_variants(input_data, {field: grid}, models_dict)))
+
+
+def sweep_2d(input_data, x_field, y_field, models_dict, n=HEATMAP_SIZE):
+    """
+    Risk surface for one patient over two inputs, others held fixed
+    Returns (x_grid, y_grid, probabilities) with probabilities[i, j] at
+    (x_grid[j], y_grid[i]); all n*n variants go through one predict_proba call.
+    Cached per (patient hash, axis pair, n, model version).
+    """
+    x_grid, y_grid = heatmap_grid(x_field, n), heatmap_grid(y_field, n)
+
+    def compute():
+        xx, yy = np.meshgrid(x_grid, y_grid)
+        proba = _score_variants(input_data, {x_field: xx.ravel(), y_field: yy.ravel()}, models_dict)
+        return x_grid, y_grid, proba.reshape(len(y_grid), len(x_grid))
+
+    return _cached(_cache_key(input_data, models_dict, x_field, y_field, n), compute)